@@ -1,14 +1,22 @@
 import hashlib  # for password hashing
 import os  # for environment variables
+import queue  # for the change feed
+import threading  # for the typeahead refresh thread
+import time  # for the typeahead refresh thread
 import traceback  # for debugging
+from concurrent.futures import ThreadPoolExecutor  # for parallel batch sub-requests
 
 import jwt  # for JWT authentication
 from dotenv import load_dotenv  # for environment variables
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, send_from_directory
 from flask_cors import CORS
 
-from utils import auth
+from utils import auth, deadline, export, fieldsets, profiling
+from utils.change_feed import ChangeFeed
 from utils.database import Database
+from utils.jobs import Job, JobQueue
+from utils.json_provider import FastJSONProvider
+from utils.typeahead import TypeaheadIndex
 
 # Load environment variables
 load_dotenv(override=True)
@@ -16,7 +24,221 @@ JWT_SECRET: str = os.getenv("JWT_SECRET")  # type: ignore
 
 # Initialize the Flask app
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
+profiling.install(app)
+
+# Limits for /api/batch
+BATCH_MAX_REQUESTS: int = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+BATCH_MAX_WORKERS: int = int(os.getenv("BATCH_MAX_WORKERS", "4"))
+
+# Request deadlines in seconds. The remaining budget is passed to every database statement and an
+# exhausted budget is answered with 504. Routes not listed get REQUEST_DEADLINE_SECONDS (0 disables);
+# None exempts the streaming routes, which are meant to stay open.
+REQUEST_DEADLINE_SECONDS: float = float(os.getenv("REQUEST_DEADLINE_SECONDS", "10"))
+ROUTE_DEADLINES: dict[str, float | None] = {
+    "autocomplete_courses": 1,
+    "search_course": 3,
+    "get_users": 5,
+    "batch": 15,
+    "change_events": None,
+    "export_table": None,
+}
+
+
+@app.before_request
+def start_deadline():
+    seconds = ROUTE_DEADLINES.get(request.endpoint, REQUEST_DEADLINE_SECONDS)  # type: ignore
+    deadline.start(seconds or None)
+
+
+@app.after_request
+def deadline_response(response: Response):
+    if g.pop("deadline_exceeded", False):
+        response.close()
+        response = jsonify({"error": "Request deadline exceeded"})
+        response.status_code = 504
+    return response
+
+
+def get_database(read_only: bool = False, user_id=None) -> Database:
+    # Sub-requests of /api/batch share the connection opened by the batch request
+    shared_db: Database | None = g.get("shared_db")
+    if shared_db is not None:
+        return shared_db
+    return Database(read_only=read_only, user_id=user_id)
+
+
+# In-memory course index behind /api/search/courses/autocomplete. Writes in this process update it
+# directly; the periodic rebuild picks up courses changed by other worker processes.
+TYPEAHEAD_REFRESH_SECONDS: float = float(os.getenv("TYPEAHEAD_REFRESH_SECONDS", "300"))
+typeahead_index = TypeaheadIndex()
+typeahead_build_lock = threading.Lock()
+
+
+def build_typeahead_index():
+    # Read on the primary: a lagging replica or a cached result would revert recent course changes
+    typeahead_index.begin_build()
+    db = Database()
+    try:
+        db.cursor.execute("SELECT CourseID, CourseName, Category FROM courses", cache=False)
+        rows = db.cursor.fetchall()
+    finally:
+        db.close()
+    typeahead_index.build(rows)
+
+
+def refresh_typeahead_index():
+    while True:
+        time.sleep(TYPEAHEAD_REFRESH_SECONDS)
+        try:
+            with typeahead_build_lock:
+                build_typeahead_index()
+        except Exception:
+            print("Error at refresh_typeahead_index: " + traceback.format_exc())
+
+
+# Course and roster change events pushed to /api/events subscribers
+CHANGE_FEED_HEARTBEAT_SECONDS: float = float(os.getenv("CHANGE_FEED_HEARTBEAT_SECONDS", "15"))
+change_feed = ChangeFeed(
+    history_size=int(os.getenv("CHANGE_FEED_HISTORY_SIZE", "1000")),
+    buffer_size=int(os.getenv("CHANGE_FEED_BUFFER_SIZE", "100")),
+)
+
+
+def ensure_typeahead_index():
+    if typeahead_index.ready:
+        return
+    with typeahead_build_lock:
+        if typeahead_index.ready:
+            return
+        build_typeahead_index()
+        if TYPEAHEAD_REFRESH_SECONDS > 0:
+            threading.Thread(target=refresh_typeahead_index, daemon=True).start()
+
+
+# Worker pool for slow admin operations (course deletion, roster imports, exports to a file).
+# Handlers enqueue a job and answer 202 with its id, GET /api/admin/jobs/<id> reports its progress.
+JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+JOB_EXPORT_DIR: str = os.getenv("JOB_EXPORT_DIR", "exports")
+# Jobs of a process that stopped renewing its lease for this long are taken over by another process
+JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# Rows written per transaction, so a large job does not hold its locks until the end
+JOB_BATCH_SIZE: int = 500
+job_queue = JobQueue(workers=JOB_WORKERS, lease_seconds=JOB_LEASE_SECONDS)
+
+
+@job_queue.register("delete_course")
+def delete_course_job(job: Job) -> dict:
+    course_id: int = job.payload["course_id"]
+    db = Database(user_id=job.payload.get("user_id"))
+    try:
+        db.cursor.execute("SELECT UserID FROM CourseEnter WHERE CourseID = %s", (course_id,), cache=False)
+        user_ids: list = [row[0] for row in db.cursor.fetchall()]  # type: ignore
+
+        # Enrollments reference the course, so they are removed first
+        removed_enrollments: int = 0
+        for start in range(0, len(user_ids), JOB_BATCH_SIZE):
+            batch: list = user_ids[start : start + JOB_BATCH_SIZE]
+            placeholders: str = ", ".join(["%s"] * len(batch))
+            db.cursor.execute(
+                f"DELETE FROM CourseEnter WHERE CourseID = %s AND UserID IN ({placeholders})",
+                (course_id, *batch),
+            )
+            removed_enrollments += db.cursor.rowcount
+            db.commit()
+            job.progress(90 * (start + len(batch)) / len(user_ids))
+
+        # Students who enrolled while the job ran, removed in the same transaction as the course
+        db.cursor.execute("DELETE FROM CourseEnter WHERE CourseID = %s", (course_id,))
+        removed_enrollments += db.cursor.rowcount
+        db.cursor.execute("DELETE FROM courses WHERE CourseID = %s", (course_id,))
+        deleted: bool = db.cursor.rowcount > 0
+        db.commit()
+    except Exception:
+        db.conn.rollback()  # type: ignore
+        raise
+    finally:
+        db.close()
+
+    if deleted:
+        typeahead_index.remove(course_id)
+        change_feed.publish("course_deleted", {"id": course_id})
+    return {"course_id": course_id, "deleted": deleted, "removed_enrollments": removed_enrollments}
+
+
+@job_queue.register("import_roster")
+def import_roster_job(job: Job) -> dict:
+    course_id: int = job.payload["course_id"]
+    emails: list[str] = job.payload["emails"]
+    enrolled: list = []
+    already_enrolled: int = 0
+    unknown_emails: list[str] = []
+    db = Database(user_id=job.payload.get("user_id"))
+    try:
+        for start in range(0, len(emails), JOB_BATCH_SIZE):
+            batch: list[str] = emails[start : start + JOB_BATCH_SIZE]
+            placeholders: str = ", ".join(["%s"] * len(batch))
+            db.cursor.execute(f"SELECT UserID, Email FROM users WHERE Email IN ({placeholders})", tuple(batch))
+            rows: list[tuple] = db.cursor.fetchall()  # type: ignore
+            user_ids: dict[str, int] = {email.lower(): user_id for user_id, email in rows}
+            unknown_emails += [email for email in batch if email.lower() not in user_ids]
+
+            batch_user_ids: list[int] = sorted(set(user_ids.values()))
+            if batch_user_ids:
+                placeholders = ", ".join(["%s"] * len(batch_user_ids))
+                db.cursor.execute(
+                    f"SELECT UserID FROM CourseEnter WHERE CourseID = %s AND UserID IN ({placeholders})",
+                    (course_id, *batch_user_ids),
+                    cache=False,
+                )
+                existing: set[int] = {row[0] for row in db.cursor.fetchall()}  # type: ignore
+                already_enrolled += len(existing)
+                for user_id in batch_user_ids:
+                    if user_id not in existing:
+                        db.cursor.execute(
+                            "INSERT INTO CourseEnter (CourseID, UserID) VALUES (%s, %s)", (course_id, user_id)
+                        )
+                        enrolled.append(user_id)
+            db.commit()
+            job.progress(100 * (start + len(batch)) / len(emails))
+    except Exception:
+        db.conn.rollback()  # type: ignore
+        raise
+    finally:
+        db.close()
+
+    for user_id in enrolled:
+        change_feed.publish("student_enrolled", {"course_id": course_id, "user_id": user_id})
+    return {
+        "course_id": course_id,
+        "enrolled": len(enrolled),
+        "already_enrolled": already_enrolled,
+        "unknown_emails": unknown_emails,
+    }
+
+
+@job_queue.register("export")
+def export_job(job: Job) -> dict:
+    export_name: str = job.payload["export_name"]
+    export_format: str = job.payload["format"]
+    use_gzip: bool = job.payload["gzip"]
+    filename: str = f"{job.id}-{export_name}.{export_format}" + (".gz" if use_gzip else "")
+    path: str = os.path.join(JOB_EXPORT_DIR, filename)
+    os.makedirs(JOB_EXPORT_DIR, exist_ok=True)
+
+    db = Database(read_only=True, user_id=job.payload.get("user_id"))
+    try:
+        rows = db.stream(export.EXPORTS[export_name][0])
+        chunks = export.export_chunks(export_name, export_format, rows, app.json.dumps, gzip=use_gzip)
+        # Written under a temporary name, so a download never sees a half written file
+        with open(path + ".part", "wb") as export_file:
+            for chunk in chunks:
+                export_file.write(chunk)
+        os.replace(path + ".part", path)
+    finally:
+        db.close()
+    return {"filename": filename, "size": os.path.getsize(path)}
 
 
 @app.route("/api/auth/login", methods=["POST"])
@@ -33,7 +255,8 @@ def login():
         # Check if the user exists in the database
         query: str = "SELECT * FROM users WHERE email = %s AND passwordhash = %s"
         values: tuple[str, str] = (email, password_hash)
-        db.cursor.execute(query, values)
+        # Credentials are always checked against the database, never the query cache
+        db.cursor.execute(query, values, cache=False)
         user_row_data: tuple | None = db.cursor.fetchone()
 
         # If the user does not exist, return an error
@@ -81,7 +304,7 @@ def register():
 
         # Check if the user already exists in the database using the email
         query: str = "SELECT * FROM users WHERE email = %s"
-        db.cursor.execute(query, (email,))
+        db.cursor.execute(query, (email,), cache=False)
         existing_user: tuple | None = db.cursor.fetchone()
 
         if existing_user:
@@ -97,7 +320,7 @@ def register():
                 """
         insert_values: tuple[str, str, str] = (username, email, password_hash)
         db.cursor.execute(insert_query, insert_values)
-        db.conn.commit()
+        db.commit()
 
         # Retrieve the newly registered user from the database
         db.cursor.execute(
@@ -131,7 +354,7 @@ def register():
 def get_profile():
     authorization: str = request.headers.get("Authorization")  # type: ignore
     profile = auth.get_profile(authorization)
-    db = Database()
+    db = get_database(read_only=True, user_id=profile.get("id"))
     try:
         query: str = "SELECT * FROM users WHERE UserID = %s"
         values = (profile.get("id", "0"),)
@@ -168,35 +391,25 @@ def get_users():
         authorization: str = request.headers.get("Authorization")  # type: ignore
         if not auth.verify_admin(authorization):
             return jsonify({"error": "Unauthorized"}), 401
+        profile: dict[str, str] = auth.get_profile(authorization)
     except jwt.ExpiredSignatureError:
         return jsonify({"message": "Token has expired"}), 401
     except jwt.InvalidTokenError:
         return jsonify({"message": "Invalid token"}), 401
 
+    # Only the requested columns are selected, see utils/fieldsets.py
+    try:
+        fieldset = fieldsets.Fieldset(fieldsets.USER_FIELDS, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     # Initialize the database connection
-    db = Database()
+    db = get_database(read_only=True, user_id=profile.get("id"))
     try:
-        db.cursor.execute("SELECT * FROM users")
+        db.cursor.execute(f"SELECT {fieldset.select()} FROM users")
         rows = db.cursor.fetchall()
 
-        users = []
-        for row in rows:
-            user = {
-                "id": row[0],
-                "username": row[1],
-                "name": row[1],
-                "email": row[2],
-                # "passwordhash": row[3],
-                "avatar": row[4],
-                "fullname": row[5],
-                "role": row[6],
-                "phone": row[7],
-                "address": row[8],
-                "gender": row[9],
-                "created_date": row[10],
-                "modify_date": row[11],
-            }
-            users.append(user)
+        users = [fieldset.to_dict(row) for row in rows]
 
         return jsonify({"users": users}), 200
     except Exception:
@@ -218,7 +431,7 @@ def update_user():
             return jsonify({"error": "Unauthorized"}), 401
 
         # Initialize the database connection
-        db = Database()
+        db = Database(user_id=profile.get("id"))
         try:
             # Fetch existing user details from the database
             query: str = "SELECT * FROM users WHERE UserID = %s"
@@ -274,7 +487,7 @@ def update_user():
                 target_user_id,
             )
             db.cursor.execute(update_query, update_values)
-            db.conn.commit()
+            db.commit()
             return jsonify({"message": "User updated successfully"}), 200
 
         except Exception as e:
@@ -301,33 +514,22 @@ def get_students():
     except jwt.InvalidTokenError:
         return jsonify({"message": "Invalid token"}), 401
 
+    # Only the requested columns are selected, see utils/fieldsets.py
+    try:
+        fieldset = fieldsets.Fieldset(fieldsets.USER_FIELDS, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     # Initialize the database connection
-    db = Database()
+    db = get_database(read_only=True, user_id=profile.get("id"))
     try:
         if profile.get("role") == "STUDENT":
-            db.cursor.execute("SELECT * FROM users WHERE UserID = %s", (profile.get("id"),))
+            db.cursor.execute(f"SELECT {fieldset.select()} FROM users WHERE UserID = %s", (profile.get("id"),))
         else:
-            db.cursor.execute("SELECT * FROM users WHERE UserRole = 'student'")
+            db.cursor.execute(f"SELECT {fieldset.select()} FROM users WHERE UserRole = 'student'")
         rows = db.cursor.fetchall()
 
-        students = []
-        for row in rows:
-            student = {
-                "id": row[0],
-                "username": row[1],
-                "name": row[1],
-                "email": row[2],
-                # "passwordhash": row[3],
-                "avatar": row[4],
-                "fullname": row[5],
-                "role": row[6],
-                "phone": row[7],
-                "address": row[8],
-                "gender": row[9],
-                "created_date": row[10],
-                "modify_date": row[11],
-            }
-            students.append(student)
+        students = [fieldset.to_dict(row) for row in rows]
 
         return jsonify({"students": students, "students_count": len(students)}), 200
     except Exception:
@@ -343,13 +545,14 @@ def add_student():
         authorization: str = request.headers.get("Authorization")  # type: ignore
         if not auth.verify_admin(authorization):
             return jsonify({"error": "Unauthorized"}), 401
+        profile: dict[str, str] = auth.get_profile(authorization)
     except jwt.ExpiredSignatureError:
         return jsonify({"message": "Token has expired"}), 401
     except jwt.InvalidTokenError:
         return jsonify({"message": "Invalid token"}), 401
 
     # Initialize the database connection
-    db = Database()
+    db = Database(user_id=profile.get("id"))
     try:
         data: dict[str, str] = request.json  # type: ignore
         email: str = data.get("email")  # type: ignore
@@ -362,7 +565,7 @@ def add_student():
 
         # Check if the user already exists in the database using the email
         query: str = "SELECT * FROM users WHERE email = %s"
-        db.cursor.execute(query, (email,))
+        db.cursor.execute(query, (email,), cache=False)
         existing_user: tuple | None = db.cursor.fetchone()
 
         if existing_user:
@@ -388,7 +591,7 @@ def add_student():
             "student",
         )
         db.cursor.execute(insert_query, insert_values)
-        db.conn.commit()
+        db.commit()
 
         return jsonify({"message": "add student successfully"}), 200
     except Exception:
@@ -411,45 +614,46 @@ def get_teachers():
     except jwt.InvalidTokenError:
         return jsonify({"message": "Invalid token"}), 401
 
+    # Only the requested columns are selected, see utils/fieldsets.py
+    try:
+        fieldset = fieldsets.Fieldset(fieldsets.TEACHER_FIELDS, request.args, relations=("courses_taught",))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     # Initialize the database connection
-    db = Database()
+    db = get_database(read_only=True, user_id=profile.get("id"))
     try:
-        db.cursor.execute("SELECT * FROM users NATURAL JOIN teachers WHERE users.UserRole = 'teacher'")
+        db.cursor.execute(
+            f"""
+            SELECT {fieldset.select("teachers.TeacherID")}
+            FROM users NATURAL JOIN teachers
+            WHERE users.UserRole = 'teacher'
+            ORDER BY teachers.TeacherID
+            """
+        )
         rows = db.cursor.fetchall()
 
         teachers = []
         for row in rows:
-            teacher = {
-                "id": row[12],
-                "userid": row[0],
-                "username": row[1],
-                "name": row[1],
-                "email": row[2],
-                # "passwordhash": row[3],
-                "avatar": row[4],
-                "fullname": row[5],
-                "role": row[6],
-                "phone": row[7],
-                "address": row[8],
-                "gender": row[9],
-                "created_date": row[10],
-                "modify_date": row[11],
-                "salary": row[13],
-            }
-
-            # Fetch courses taught by this teacher
-            db.cursor.execute(
-                """
-                SELECT CourseID, CourseName, Category
-                FROM courses
-                WHERE TeacherID = %s
-                """,
-                (teacher["id"],),  # type: ignore
-            )
-            courses_taught = db.cursor.fetchall()
-            courses_info = [{"id": course[0], "name": course[1], "category": course[2]} for course in courses_taught]
-
-            teacher["courses_taught"] = courses_info
+            teacher = fieldset.to_dict(row)
+
+            # Fetch courses taught by this teacher, unless they were not asked for
+            if "courses_taught" in fieldset.relations:
+                # The course list is only useful together with the teacher it belongs to
+                teacher["id"] = row[-1]
+                db.cursor.execute(
+                    """
+                    SELECT CourseID, CourseName, Category
+                    FROM courses
+                    WHERE TeacherID = %s
+                    ORDER BY CourseID
+                    """,
+                    (row[-1],),
+                )
+                courses_taught = db.cursor.fetchall()
+                teacher["courses_taught"] = [
+                    {"id": course[0], "name": course[1], "category": course[2]} for course in courses_taught
+                ]
             teachers.append(teacher)
 
         return jsonify({"teachers": teachers, "teachers_count": len(teachers)}), 200
@@ -473,37 +677,39 @@ def get_courses():
     except jwt.InvalidTokenError:
         return jsonify({"message": "Invalid token"}), 401
 
+    # Only the requested columns are selected, see utils/fieldsets.py
+    try:
+        fieldset = fieldsets.Fieldset(fieldsets.COURSE_FIELDS, request.args, relations=("entered_students",))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     # Initialize the database connection
-    db = Database()
+    db = get_database(read_only=True, user_id=profile.get("id"))
     try:
-        db.cursor.execute("SELECT * FROM courses")
+        db.cursor.execute(f"SELECT {fieldset.select('CourseID')} FROM courses ORDER BY CourseID")
         rows = db.cursor.fetchall()
 
         courses = []
         for row in rows:
-            course = {
-                "id": row[0],
-                "name": row[1],
-                "description": row[2],
-                "category": row[3],
-                "teacher_id": row[4],
-                "created_date": row[5],
-                "modify_date": row[6],
-            }
-            # Fetch entered students for each course
-            db.cursor.execute(
-                """
-                SELECT ce.UserID, u.username
-                FROM courseEnter ce INNER JOIN users u
-                ON ce.UserID = u.UserID
-                WHERE ce.CourseID = %s
-                """,
-                (course["id"],),  # type: ignore
-            )  # type: ignore
-            entered_students_info = db.cursor.fetchall()
-            entered_students = [{"id": student[0], "username": student[1]} for student in entered_students_info]
-
-            course["entered_students"] = entered_students
+            course = fieldset.to_dict(row)
+            # Fetch entered students for each course, unless they were not asked for
+            if "entered_students" in fieldset.relations:
+                # The roster is only useful together with the course it belongs to
+                course["id"] = row[-1]
+                db.cursor.execute(
+                    """
+                    SELECT ce.UserID, u.username
+                    FROM courseEnter ce INNER JOIN users u
+                    ON ce.UserID = u.UserID
+                    WHERE ce.CourseID = %s
+                    ORDER BY ce.UserID
+                    """,
+                    (row[-1],),
+                )
+                entered_students_info = db.cursor.fetchall()
+                course["entered_students"] = [
+                    {"id": student[0], "username": student[1]} for student in entered_students_info
+                ]
 
             courses.append(course)
 
@@ -528,37 +734,39 @@ def modify_get_courses():
     except jwt.InvalidTokenError:
         return jsonify({"message": "Invalid token"}), 401
 
+    # Only the requested columns are selected, see utils/fieldsets.py
+    try:
+        fieldset = fieldsets.Fieldset(fieldsets.COURSE_FIELDS, request.args, relations=("entered_students",))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     # Initialize the database connection
-    db = Database()
+    db = get_database(read_only=True, user_id=profile.get("id"))
     try:
-        db.cursor.execute("SELECT * FROM courses")
+        db.cursor.execute(f"SELECT {fieldset.select('CourseID')} FROM courses ORDER BY CourseID")
         rows = db.cursor.fetchall()
 
         courses = []
         for row in rows:
-            course = {
-                "id": row[0],
-                "name": row[1],
-                "description": row[2],
-                "category": row[3],
-                "teacher_id": row[4],
-                "created_date": row[5],
-                "modify_date": row[6],
-            }
-            # Fetch entered students for each course
-            db.cursor.execute(
-                """
-                SELECT ce.UserID, u.username
-                FROM courseEnter ce INNER JOIN users u
-                ON ce.UserID = u.UserID
-                WHERE ce.CourseID = %s
-                """,
-                (course["id"],),  # type: ignore
-            )  # type: ignore
-            entered_students_info = db.cursor.fetchall()
-            entered_students = [{"id": student[0], "username": student[1]} for student in entered_students_info]
-
-            course["entered_students"] = entered_students
+            course = fieldset.to_dict(row)
+            # Fetch entered students for each course, unless they were not asked for
+            if "entered_students" in fieldset.relations:
+                # The roster is only useful together with the course it belongs to
+                course["id"] = row[-1]
+                db.cursor.execute(
+                    """
+                    SELECT ce.UserID, u.username
+                    FROM courseEnter ce INNER JOIN users u
+                    ON ce.UserID = u.UserID
+                    WHERE ce.CourseID = %s
+                    ORDER BY ce.UserID
+                    """,
+                    (row[-1],),
+                )
+                entered_students_info = db.cursor.fetchall()
+                course["entered_students"] = [
+                    {"id": student[0], "username": student[1]} for student in entered_students_info
+                ]
 
             courses.append(course)
 
@@ -583,7 +791,7 @@ def enter_course():
     except jwt.InvalidTokenError:
         return jsonify({"message": "Invalid token"}), 401
     # Initialize the database connection
-    db = Database()
+    db = Database(user_id=profile.get("id"))
     try:
         data: dict[str, str] = request.json  # type: ignore
         course_name: str = data.get("course_name")  # type: ignore
@@ -619,7 +827,8 @@ def enter_course():
                 """
         insert_values: tuple[str, str] = (course_id, user_id)
         db.cursor.execute(insert_query, insert_values)
-        db.conn.commit()
+        db.commit()
+        change_feed.publish("student_enrolled", {"course_id": course_id, "user_id": user_id})
 
         return jsonify({"message": "enter course successfully"}), 200
     except Exception:
@@ -629,6 +838,144 @@ def enter_course():
         return jsonify({"error": "Internal server error: " + error_info}), 500
 
 
+def get_pagination() -> tuple[int, int]:
+    page: int = max(int(request.args.get("page", "1")), 1)
+    per_page: int = min(max(int(request.args.get("per_page", "20")), 1), 100)
+    return page, per_page
+
+
+@app.route("/api/student/courses", methods=["GET"])
+def get_my_entered_courses():
+    authority_roles = ["ADMIN", "STUDENT"]
+    try:
+        authorization: str = request.headers.get("Authorization")  # type: ignore
+        profile: dict[str, str] = auth.get_profile(authorization)
+        if profile.get("role") not in authority_roles:
+            return jsonify({"error": "Unauthorized"}), 401
+    except jwt.ExpiredSignatureError:
+        return jsonify({"message": "Token has expired"}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({"message": "Invalid token"}), 401
+
+    try:
+        page, per_page = get_pagination()
+        fieldset = fieldsets.Fieldset(fieldsets.JOINED_COURSE_FIELDS, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Initialize the database connection
+    db = get_database(read_only=True, user_id=profile.get("id"))
+    try:
+        user_id: str = profile.get("id")  # type: ignore
+
+        # Both queries only touch the (UserID, CourseID) index of CourseEnter and the courses primary key
+        db.cursor.execute("SELECT COUNT(*) FROM CourseEnter WHERE UserID = %s", (user_id,))
+        total_count: int = db.cursor.fetchone()[0]  # type: ignore
+
+        db.cursor.execute(
+            f"""
+            SELECT {fieldset.select()}
+            FROM CourseEnter ce INNER JOIN courses c
+            ON ce.CourseID = c.CourseID
+            WHERE ce.UserID = %s
+            ORDER BY ce.CourseID
+            LIMIT %s OFFSET %s
+            """,
+            (user_id, per_page, (page - 1) * per_page),
+        )
+        rows = db.cursor.fetchall()
+
+        courses = [fieldset.to_dict(row) for row in rows]
+
+        return (
+            jsonify(
+                {
+                    "courses": courses,
+                    "courses_count": len(courses),
+                    "total_count": total_count,
+                    "page": page,
+                    "per_page": per_page,
+                }
+            ),
+            200,
+        )
+    except Exception:
+        db.conn.rollback()
+        error_info = traceback.format_exc()
+        print("Error at get_my_entered_courses: " + error_info)
+        return jsonify({"error": "Internal server error: " + error_info}), 500
+
+
+@app.route("/api/teacher/courses", methods=["GET"])
+def get_my_taught_courses():
+    authority_roles = ["ADMIN", "TEACHER"]
+    try:
+        authorization: str = request.headers.get("Authorization")  # type: ignore
+        profile: dict[str, str] = auth.get_profile(authorization)
+        if profile.get("role") not in authority_roles:
+            return jsonify({"error": "Unauthorized"}), 401
+    except jwt.ExpiredSignatureError:
+        return jsonify({"message": "Token has expired"}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({"message": "Invalid token"}), 401
+
+    try:
+        page, per_page = get_pagination()
+        fieldset = fieldsets.Fieldset(fieldsets.JOINED_COURSE_FIELDS, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Initialize the database connection
+    db = get_database(read_only=True, user_id=profile.get("id"))
+    try:
+        user_id: str = profile.get("id")  # type: ignore
+
+        # teachers is looked up by its UserID index, courses by its (TeacherID, CourseID) index
+        db.cursor.execute(
+            """
+            SELECT COUNT(*)
+            FROM teachers t INNER JOIN courses c
+            ON t.TeacherID = c.TeacherID
+            WHERE t.UserID = %s
+            """,
+            (user_id,),
+        )
+        total_count: int = db.cursor.fetchone()[0]  # type: ignore
+
+        db.cursor.execute(
+            f"""
+            SELECT {fieldset.select()}
+            FROM teachers t INNER JOIN courses c
+            ON t.TeacherID = c.TeacherID
+            WHERE t.UserID = %s
+            ORDER BY c.CourseID
+            LIMIT %s OFFSET %s
+            """,
+            (user_id, per_page, (page - 1) * per_page),
+        )
+        rows = db.cursor.fetchall()
+
+        courses = [fieldset.to_dict(row) for row in rows]
+
+        return (
+            jsonify(
+                {
+                    "courses": courses,
+                    "courses_count": len(courses),
+                    "total_count": total_count,
+                    "page": page,
+                    "per_page": per_page,
+                }
+            ),
+            200,
+        )
+    except Exception:
+        db.conn.rollback()
+        error_info = traceback.format_exc()
+        print("Error at get_my_taught_courses: " + error_info)
+        return jsonify({"error": "Internal server error: " + error_info}), 500
+
+
 @app.route("/api/admin/courses", methods=["POST"])
 def add_course():
     try:
@@ -642,7 +989,7 @@ def add_course():
         return jsonify({"message": "Invalid token"}), 401
 
     # Initialize the database connection
-    db = Database()
+    db = Database(user_id=profile.get("id"))
     try:
         data: dict[str, str] = request.json  # type: ignore
         course_name: str = data.get("name")  # type: ignore
@@ -674,7 +1021,18 @@ def add_course():
             course_teacher_id,
         )
         db.cursor.execute(insert_query, insert_values)
-        db.conn.commit()
+        db.commit()
+        typeahead_index.add(db.cursor.lastrowid, course_name, course_category)
+        change_feed.publish(
+            "course_created",
+            {
+                "id": db.cursor.lastrowid,
+                "name": course_name,
+                "description": course_description,
+                "category": course_category,
+                "teacher_id": course_teacher_id,
+            },
+        )
 
         return jsonify({"message": "add course successfully"}), 200
     except Exception:
@@ -700,7 +1058,7 @@ def update_course():
         return jsonify({"message": "Invalid token"}), 401
 
     # Initialize the database connection
-    db = Database()
+    db = Database(user_id=profile.get("id"))
     try:
         data: dict[str, str] = request.json  # type: ignore
         course_id: str = data.get("id")  # type: ignore
@@ -741,7 +1099,18 @@ def update_course():
             course_id,
         )
         db.cursor.execute(update_query, update_values)
-        db.conn.commit()
+        db.commit()
+        typeahead_index.add(int(course_id), course_name, course_category)
+        change_feed.publish(
+            "course_updated",
+            {
+                "id": int(course_id),
+                "name": course_name,
+                "description": course_description,
+                "category": course_category,
+                "teacher_id": course_teacher_id,
+            },
+        )
 
         return jsonify({"message": "Course updated successfully"}), 200
 
@@ -765,7 +1134,7 @@ def delete_course(course_id):
         return jsonify({"message": "Invalid token"}), 401
 
     # Initialize the database connection
-    db = Database()
+    db = Database(user_id=profile.get("id"))
     try:
         # Fetch existing course details from the database
         query: str = "SELECT * FROM courses WHERE CourseID = %s"
@@ -775,11 +1144,23 @@ def delete_course(course_id):
         if not existing_course:
             return jsonify({"error": "Course does not exist!"}), 404  # 404 for Not Found
 
+        # Courses with many enrollments can be deleted in the background with ?async=1
+        if request.args.get("async") == "1":
+            job_id: int = job_queue.enqueue(
+                "delete_course", {"course_id": course_id, "user_id": profile.get("id")}, user_id=profile.get("id")
+            )
+            return jsonify({"message": "Course deletion queued", "job_id": job_id}), 202
+
+        # Enrollments reference the course, so they are removed first
+        db.cursor.execute("DELETE FROM CourseEnter WHERE CourseID = %s", (course_id,))
+
         # Delete the course in the database
         delete_query: str = "DELETE FROM courses WHERE CourseID = %s"
         delete_values: tuple[str] = (course_id,)
         db.cursor.execute(delete_query, delete_values)
-        db.conn.commit()
+        db.commit()
+        typeahead_index.remove(course_id)
+        change_feed.publish("course_deleted", {"id": course_id})
 
         return jsonify({"message": "Course deleted successfully"}), 200
 
@@ -793,7 +1174,7 @@ def delete_course(course_id):
 @app.route("/api/search/courses", methods=["GET"])
 def search_course():
     # Initialize the database connection
-    db = Database()
+    db = get_database(read_only=True)
     try:
         data: dict[str, str] = request.json  # type: ignore
         print(data)
@@ -836,6 +1217,350 @@ def search_course():
         return jsonify({"error": "Internal server error: " + error_info}), 500
 
 
+@app.route("/api/search/courses/autocomplete", methods=["GET"])
+def autocomplete_courses():
+    try:
+        query: str = request.args.get("q", "")
+        limit: int = max(1, min(int(request.args.get("limit", "10")), 50))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    try:
+        # Served from memory, MySQL is only read when the index is first built
+        ensure_typeahead_index()
+        suggestions: list[dict] = typeahead_index.search(query, limit)
+        return jsonify({"suggestions": suggestions, "suggestions_count": len(suggestions)}), 200
+    except Exception:
+        error_info = traceback.format_exc()
+        print("Error at autocomplete_courses: " + error_info)
+        return jsonify({"error": "Internal server error: " + error_info}), 500
+
+
+@app.route("/api/events", methods=["GET"])
+def change_events():
+    authority_roles = ["ADMIN", "TEACHER", "STUDENT"]
+    try:
+        # EventSource cannot set headers, so the token may also be passed as ?token=
+        authorization: str = request.headers.get("Authorization")  # type: ignore
+        if not authorization and request.args.get("token"):
+            authorization = "Bearer " + request.args["token"]
+        profile: dict[str, str] = auth.get_profile(authorization)
+        if profile.get("role") not in authority_roles:
+            return jsonify({"error": "Unauthorized"}), 401
+    except jwt.ExpiredSignatureError:
+        return jsonify({"message": "Token has expired"}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({"message": "Invalid token"}), 401
+
+    last_event_id: str | None = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+
+    def format_event(entry: tuple) -> str:
+        sequence, event, data = entry
+        payload: str = app.json.dumps(data, separators=(",", ":"))
+        return f"id: {change_feed.event_id(sequence)}\nevent: {event}\ndata: {payload}\n\n"
+
+    def generate():
+        # Subscribing inside the generator means a response that is never iterated leaves nothing behind
+        subscriber, replay, missed_events = change_feed.subscribe(last_event_id)
+        try:
+            # Sent right away so proxies flush the headers; also sets the client's reconnect delay
+            yield "retry: 3000\n\n"
+            # The client was away longer than the history covers and has to reload its lists
+            if missed_events:
+                yield "event: reset\ndata: {}\n\n"
+            for entry in replay:
+                yield format_event(entry)
+            while True:
+                try:
+                    entry = subscriber.queue.get(timeout=CHANGE_FEED_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    if subscriber.overflowed:
+                        # Too slow to keep up: end the stream, the client resumes with Last-Event-ID
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(entry)
+                if subscriber.overflowed and subscriber.queue.empty():
+                    return
+        finally:
+            change_feed.unsubscribe(subscriber)
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/admin/export/<string:export_name>", methods=["GET"])
+def export_table(export_name):
+    try:
+        authorization: str = request.headers.get("Authorization")  # type: ignore
+        if not auth.verify_admin(authorization):
+            return jsonify({"error": "Unauthorized"}), 401
+        profile: dict[str, str] = auth.get_profile(authorization)
+    except jwt.ExpiredSignatureError:
+        return jsonify({"message": "Token has expired"}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({"message": "Invalid token"}), 401
+
+    export_format: str = request.args.get("format", "csv")
+    use_gzip: bool = request.args.get("gzip", "0") == "1"
+    if export_name not in export.EXPORTS:
+        return jsonify({"error": f"Unknown export: {export_name}"}), 404
+    if export_format not in export.FORMATS:
+        return jsonify({"error": f"Unknown format: {export_format}"}), 400
+
+    # With ?async=1 the export is written to a file by a background job, see /api/admin/jobs/<id>/file
+    if request.args.get("async") == "1":
+        payload: dict = {
+            "export_name": export_name,
+            "format": export_format,
+            "gzip": use_gzip,
+            "user_id": profile.get("id"),
+        }
+        job_id: int = job_queue.enqueue("export", payload, user_id=profile.get("id"))
+        return jsonify({"message": "Export queued", "job_id": job_id}), 202
+
+    # Initialize the database connection, on MySQL the rows are read on a connection of the stream's own
+    db = Database(read_only=True, user_id=profile.get("id"))
+    query: str = export.EXPORTS[export_name][0]
+    rows = db.stream(query)
+    chunks = export.export_chunks(export_name, export_format, rows, app.json.dumps, gzip=use_gzip)
+
+    filename: str = f"{export_name}.{export_format}"
+    mimetype: str = export.FORMATS[export_format]
+    if use_gzip:
+        filename += ".gz"
+        mimetype = "application/gzip"
+
+    def generate():
+        try:
+            yield from chunks
+        except Exception:
+            # Headers are already sent. Re-raising makes the server drop the connection without the final
+            # chunk, so the client sees a broken download instead of a complete-looking truncated file.
+            print("Error at export_table: " + traceback.format_exc())
+            raise
+        finally:
+            chunks.close()
+            rows.close()
+            db.close()
+
+    return Response(
+        generate(),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+@app.route("/api/admin/courses/<int:course_id>/roster", methods=["POST"])
+def import_roster(course_id):
+    try:
+        authorization: str = request.headers.get("Authorization")  # type: ignore
+        if not auth.verify_admin(authorization):
+            return jsonify({"error": "Unauthorized"}), 401
+        profile: dict[str, str] = auth.get_profile(authorization)
+    except jwt.ExpiredSignatureError:
+        return jsonify({"message": "Token has expired"}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({"message": "Invalid token"}), 401
+
+    data: dict = request.json  # type: ignore
+    emails: list[str] = data.get("emails")  # type: ignore
+    if not isinstance(emails, list) or not emails or not all(isinstance(email, str) for email in emails):
+        return jsonify({"error": "emails must be a non-empty list of strings"}), 400
+
+    # Initialize the database connection
+    db = Database(read_only=True, user_id=profile.get("id"))
+    try:
+        db.cursor.execute("SELECT CourseID FROM courses WHERE CourseID = %s", (course_id,))
+        if db.cursor.fetchone() is None:
+            return jsonify({"error": "Course does not exist!"}), 404
+
+        # The students are enrolled by a background job
+        job_id: int = job_queue.enqueue(
+            "import_roster",
+            {"course_id": course_id, "emails": emails, "user_id": profile.get("id")},
+            user_id=profile.get("id"),
+        )
+        return jsonify({"message": "Roster import queued", "job_id": job_id}), 202
+    except Exception:
+        db.conn.rollback()
+        error_info = traceback.format_exc()
+        print("Error at import_roster: " + error_info)
+        return jsonify({"error": "Internal server error: " + error_info}), 500
+
+
+@app.route("/api/admin/jobs", methods=["GET"])
+def get_jobs():
+    try:
+        authorization: str = request.headers.get("Authorization")  # type: ignore
+        if not auth.verify_admin(authorization):
+            return jsonify({"error": "Unauthorized"}), 401
+    except jwt.ExpiredSignatureError:
+        return jsonify({"message": "Token has expired"}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({"message": "Invalid token"}), 401
+
+    try:
+        page, per_page = get_pagination()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        # Also resumes the jobs left over from a restart, if no job was enqueued since
+        job_queue.start()
+        job_list, total_count = job_queue.list_jobs(per_page, (page - 1) * per_page, request.args.get("status"))
+        return (
+            jsonify(
+                {
+                    "jobs": job_list,
+                    "jobs_count": len(job_list),
+                    "total_count": total_count,
+                    "page": page,
+                    "per_page": per_page,
+                }
+            ),
+            200,
+        )
+    except Exception:
+        error_info = traceback.format_exc()
+        print("Error at get_jobs: " + error_info)
+        return jsonify({"error": "Internal server error: " + error_info}), 500
+
+
+def get_visible_job(job_id: int, profile: dict[str, str]) -> dict | None:
+    # Admins see every job, teachers the course deletions they queued
+    job_queue.start()
+    job = job_queue.get_job(job_id)
+    if job is None or (profile.get("role") != "ADMIN" and str(job["created_by"]) != str(profile.get("id"))):
+        return None
+    return job
+
+
+@app.route("/api/admin/jobs/<int:job_id>", methods=["GET"])
+def get_job(job_id):
+    try:
+        authorization: str = request.headers.get("Authorization")  # type: ignore
+        profile: dict[str, str] = auth.get_profile(authorization)
+        if not (profile.get("role") == "ADMIN" or profile.get("role") == "TEACHER"):
+            return jsonify({"error": "Unauthorized"}), 401
+    except jwt.ExpiredSignatureError:
+        return jsonify({"message": "Token has expired"}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({"message": "Invalid token"}), 401
+
+    try:
+        job = get_visible_job(job_id, profile)
+        if job is None:
+            return jsonify({"error": "Job does not exist!"}), 404
+        return jsonify({"job": job}), 200
+    except Exception:
+        error_info = traceback.format_exc()
+        print("Error at get_job: " + error_info)
+        return jsonify({"error": "Internal server error: " + error_info}), 500
+
+
+@app.route("/api/admin/jobs/<int:job_id>/file", methods=["GET"])
+def get_job_file(job_id):
+    try:
+        authorization: str = request.headers.get("Authorization")  # type: ignore
+        if not auth.verify_admin(authorization):
+            return jsonify({"error": "Unauthorized"}), 401
+        profile: dict[str, str] = auth.get_profile(authorization)
+    except jwt.ExpiredSignatureError:
+        return jsonify({"message": "Token has expired"}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({"message": "Invalid token"}), 401
+
+    try:
+        job = get_visible_job(job_id, profile)
+        if job is None or job["type"] != "export":
+            return jsonify({"error": "Export job does not exist!"}), 404
+        if job["status"] != "done":
+            return jsonify({"error": f"Export is {job['status']}", "progress": job["progress"]}), 409
+        return send_from_directory(os.path.abspath(JOB_EXPORT_DIR), job["result"]["filename"], as_attachment=True)
+    except Exception:
+        error_info = traceback.format_exc()
+        print("Error at get_job_file: " + error_info)
+        return jsonify({"error": "Internal server error: " + error_info}), 500
+
+
+def dispatch_sub_request(sub_request: dict, authorization: str | None) -> dict:
+    request_id = sub_request.get("id")
+    method: str = str(sub_request.get("method", "GET")).upper()
+    path: str = str(sub_request.get("path", ""))
+    if method != "GET":
+        return {"id": request_id, "status": 405, "body": {"error": "Only GET sub-requests can be batched"}}
+    if not path.startswith("/api/") or path.startswith("/api/batch"):
+        return {"id": request_id, "status": 400, "body": {"error": f"Invalid path: {path}"}}
+
+    headers: dict[str, str] = {"Authorization": authorization} if authorization else {}
+    try:
+        with app.test_request_context(path, method=method, headers=headers, json=sub_request.get("body")):
+            response = app.full_dispatch_request()
+    except Exception:
+        error_info = traceback.format_exc()
+        print("Error at batch sub-request " + path + ": " + error_info)
+        return {"id": request_id, "status": 500, "body": {"error": "Internal server error: " + error_info}}
+
+    # Exports and other streamed responses would hold the batch open, so they are refused.
+    # Werkzeug's error pages (unknown path, wrong method) are streamed as well but are short.
+    if response.is_streamed and response.status_code < 400:
+        response.close()
+        return {"id": request_id, "status": 400, "body": {"error": f"Streaming endpoint cannot be batched: {path}"}}
+    return {"id": request_id, "status": response.status_code, "body": response.get_json(silent=True)}
+
+
+@app.route("/api/batch", methods=["POST"])
+def batch():
+    authorization: str | None = request.headers.get("Authorization")
+    try:
+        # Authenticate once for every sub-request
+        profile: dict[str, str] = auth.get_profile(authorization)  # type: ignore
+    except jwt.ExpiredSignatureError:
+        return jsonify({"message": "Token has expired"}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({"message": "Invalid token"}), 401
+
+    data: dict = request.json  # type: ignore
+    if not isinstance(data, dict):
+        return jsonify({"error": "The request body must be a JSON object"}), 400
+    sub_requests: list[dict] = data.get("requests", [])
+    parallel: bool = bool(data.get("parallel", False))
+    if not isinstance(sub_requests, list) or not all(isinstance(sub, dict) for sub in sub_requests):
+        return jsonify({"error": "requests must be a list of objects"}), 400
+    if len(sub_requests) > BATCH_MAX_REQUESTS:
+        return jsonify({"error": f"At most {BATCH_MAX_REQUESTS} requests can be batched"}), 400
+
+    if parallel and len(sub_requests) > 1:
+        # Connections are not thread safe, so each worker checks out its own pooled connection
+        request_deadline: float | None = g.get("deadline")
+
+        def run_in_worker(sub_request: dict) -> dict:
+            with app.app_context():
+                g.verified_authorization = authorization
+                g.verified_profile = profile
+                g.deadline = request_deadline
+                return dispatch_sub_request(sub_request, authorization)
+
+        with ThreadPoolExecutor(max_workers=min(BATCH_MAX_WORKERS, len(sub_requests))) as executor:
+            responses = list(executor.map(run_in_worker, sub_requests))
+    else:
+        # Sub-requests run in this app context, sharing its g and a single pooled connection
+        g.verified_authorization = authorization
+        g.verified_profile = profile
+        g.shared_db = Database(read_only=True, user_id=profile.get("id"))
+        try:
+            responses = [dispatch_sub_request(sub_request, authorization) for sub_request in sub_requests]
+        finally:
+            g.shared_db.close()
+            g.shared_db = None
+
+    return jsonify({"responses": responses}), 200
+
+
 @app.route("/users", methods=["GET"])
 def test_get_users():
     # Initialize the database connection
@@ -900,4 +1625,16 @@ def test_delete_user(user_id):
 
 
 if __name__ == "__main__":
+    # Build the autocomplete index at startup rather than on the first keystroke
+    try:
+        ensure_typeahead_index()
+    except Exception:
+        print("Error at ensure_typeahead_index: " + traceback.format_exc())
+    # Resume the jobs of stopped servers. With debug=True this module also runs in the reloader's
+    # parent process, which only watches files, so the workers start in the child that serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        try:
+            job_queue.start()
+        except Exception:
+            print("Error at job_queue.start: " + traceback.format_exc())
     app.run(debug=True, host="0.0.0.0", port=5000)
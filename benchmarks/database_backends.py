@@ -0,0 +1,93 @@
+# Compares the MySQL and embedded SQLite backends on the read routes of app.py.
+#
+#   python -m benchmarks.database_backends [iterations]
+#
+# Each backend runs in its own process, logs in as the seeded admin user and times the routes
+# through Flask's test client. MySQL uses the connection settings from .env; SQLite uses a fresh
+# database file in a temporary directory.
+# The query cache is disabled so every request reaches the database.
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROUTES: list[tuple[str, str, dict | None]] = [
+    ("GET", "/api/auth/profile", None),
+    ("GET", "/api/admin/users", None),
+    ("GET", "/api/admin/students", None),
+    ("GET", "/api/admin/teachers", None),
+    ("GET", "/api/admin/courses", None),
+    ("GET", "/api/admin/courses?fields=id,name", None),
+    ("GET", "/api/search/courses", {"name": "Yoga"}),
+    ("GET", "/api/student/courses", None),
+    ("POST", "/api/auth/login", {"email": "admin@gmail.com", "password": "dummyPass"}),
+]
+
+
+def run_routes(backend: str, iterations: int, sqlite_path: str) -> dict[str, float]:
+    import app as backend_app
+    from utils import database
+
+    # Set after the import, since load_dotenv(override=True) would let .env win over our environment
+    database.backend = database.BACKENDS[backend]()
+    database.SQLITE_PATH = sqlite_path
+    database.QUERY_CACHE_ENABLED = False
+    database.Database().close()  # fail with the connection error rather than an HTTP 500
+
+    client = backend_app.app.test_client()
+    response = client.post("/api/auth/login", json={"email": "admin@gmail.com", "password": "dummyPass"})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    headers = {"Authorization": "Bearer " + response.json["accessToken"]}  # type: ignore
+
+    timings: dict[str, float] = {}
+    for method, path, body in ROUTES:
+        client.open(path, method=method, json=body, headers=headers)  # warm up pools and caches
+        start = time.perf_counter()
+        for _ in range(iterations):
+            response = client.open(path, method=method, json=body, headers=headers)
+            assert response.status_code == 200, f"{path}: {response.status_code}"
+        timings[f"{method} {path}"] = (time.perf_counter() - start) / iterations
+    return timings
+
+
+def measure(backend: str, iterations: int, sqlite_dir: str) -> dict[str, float] | str:
+    env = dict(os.environ)
+    env.setdefault("DB_NAME", "fit_lohas")
+    env.setdefault("JWT_SECRET", "benchmark-secret-benchmark-secret")
+    sqlite_path = os.path.join(sqlite_dir, "fit_lohas.sqlite3")
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.database_backends", "--child", backend, str(iterations), sqlite_path],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return (result.stderr.strip().splitlines() or ["failed"])[-1]
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(iterations: int = 200):
+    with tempfile.TemporaryDirectory() as sqlite_dir:
+        results = {backend: measure(backend, iterations, sqlite_dir) for backend in ("mysql", "sqlite")}
+
+    for backend, result in results.items():
+        if isinstance(result, str):
+            print(f"{backend}: skipped ({result})")
+
+    print(f"{'route':<45} {'mysql':>10} {'sqlite':>10}")
+    for method, path, _ in ROUTES:
+        route = f"{method} {path}"
+        cells = []
+        for backend in ("mysql", "sqlite"):
+            result = results[backend]
+            cells.append("-" if isinstance(result, str) else f"{result[route] * 1000:.3f}ms")
+        print(f"{route:<45} {cells[0]:>10} {cells[1]:>10}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        print(json.dumps(run_routes(sys.argv[2], int(sys.argv[3]), sys.argv[4])))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,101 @@
+# Micro-benchmark of the JSON providers over payloads shaped like our API responses.
+#
+#   python -m benchmarks.json_serialization [rows]
+#
+# Checks that FastJSONProvider produces exactly the same bytes as Flask's default
+# provider, then times both on the get_users, get_teachers and get_courses payloads.
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from utils.json_provider import FastJSONProvider, orjson
+
+CATEGORIES = ["Kickboxing", "Strength Training", "Yoga", "Pilates", "Swimming"]
+
+
+def make_user(user_id: int, role: str) -> dict:
+    created = datetime(2023, 9, 1) + timedelta(minutes=user_id * 7)
+    return {
+        "id": user_id,
+        "username": f"user{user_id:05d}",
+        "name": f"user{user_id:05d}",
+        "email": f"user{user_id:05d}@gmail.com",
+        "avatar": "/assets/images/avatars/000-default.png ",
+        "fullname": f"User Number {user_id}",
+        "role": role,
+        "phone": f"09{user_id:08d}",
+        "address": "Taiwan NCHU",
+        "gender": random.choice(["Male", "Female", "Other", None]),
+        "created_date": created,
+        "modify_date": created + timedelta(days=3),
+    }
+
+
+def make_payloads(rows: int) -> dict[str, dict]:
+    random.seed(112)
+    users = [make_user(user_id, "STUDENT") for user_id in range(1, rows + 1)]
+
+    teachers = []
+    for teacher_id in range(1, rows // 10 + 1):
+        teacher = make_user(teacher_id, "TEACHER")
+        teacher["userid"] = teacher_id
+        teacher["salary"] = Decimal(f"{random.randint(50000, 250000)}.00")
+        teacher["courses_taught"] = [
+            {"id": course_id, "name": f"Course {course_id}", "category": random.choice(CATEGORIES)}
+            for course_id in range(teacher_id * 3, teacher_id * 3 + 3)
+        ]
+        teachers.append(teacher)
+
+    courses = []
+    for course_id in range(1, rows // 5 + 1):
+        created = datetime(2023, 10, 1) + timedelta(hours=course_id)
+        courses.append(
+            {
+                "id": course_id,
+                "name": f"Course {course_id}",
+                "description": "High-energy workout combining martial arts techniques and heart-pumping cardio.",
+                "category": random.choice(CATEGORIES),
+                "teacher_id": random.randint(1, max(rows // 10, 1)),
+                "created_date": created,
+                "modify_date": created,
+                "entered_students": [
+                    {"id": user["id"], "username": user["username"]} for user in random.sample(users, min(20, rows))
+                ],
+            }
+        )
+
+    return {
+        "users": {"users": users},
+        "teachers": {"teachers": teachers, "teachers_count": len(teachers)},
+        "courses": {"courses": courses, "courses_count": len(courses)},
+    }
+
+
+def main(rows: int = 2000, number: int = 20):
+    app = Flask(__name__)
+    default_provider = DefaultJSONProvider(app)
+    fast_provider = FastJSONProvider(app)
+    print(f"orjson: {'available' if orjson is not None else 'not installed, measuring the stdlib fallback'}")
+
+    with app.app_context():
+        for name, payload in make_payloads(rows).items():
+            expected = default_provider.response(payload).get_data()
+            actual = fast_provider.response(payload).get_data()
+            assert actual == expected, f"{name}: output differs from the default provider"
+
+            default_time = timeit.timeit(lambda: default_provider.response(payload), number=number) / number
+            fast_time = timeit.timeit(lambda: fast_provider.response(payload), number=number) / number
+            print(
+                f"{name:<10} {len(expected) / 1024:8.1f} KiB  "
+                f"default {default_time * 1000:8.2f} ms  fast {fast_time * 1000:8.2f} ms  "
+                f"speedup {default_time / fast_time:5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -2,6 +2,7 @@ import os
 
 import jwt
 from dotenv import load_dotenv
+from flask import g, has_app_context
 
 load_dotenv(override=True)
 
@@ -28,5 +29,8 @@ def verify_admin(authorization: str) -> bool:
 def get_profile(authorization: str) -> dict[str, str]:
     if not authorization or not authorization.startswith("Bearer "):
         return {}
+    # Sub-requests of /api/batch reuse the profile the batch request already verified
+    if has_app_context() and g.get("verified_authorization") == authorization:
+        return dict(g.verified_profile)
     access_token = authorization.split(" ")[1]
     return decode_token(access_token)
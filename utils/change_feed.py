@@ -0,0 +1,66 @@
+import queue
+import threading
+import time
+from collections import deque
+
+
+class Subscriber:
+    def __init__(self, buffer_size: int):
+        # Bounded, so a client that stops reading cannot make the server buffer events forever
+        self.queue: queue.Queue = queue.Queue(maxsize=buffer_size)
+        self.overflowed: bool = False
+
+
+class ChangeFeed:
+    # In-process pub/sub for Server-Sent Events.
+    #
+    # Event ids look like "<boot>-<sequence>". The boot part changes on every restart, so a
+    # Last-Event-ID from an earlier run is recognised as unknown instead of being compared
+    # with a sequence that started over. The last history_size events are kept for replay.
+    def __init__(self, history_size: int = 1000, buffer_size: int = 100):
+        self.lock = threading.Lock()
+        self.boot: str = str(int(time.time() * 1000))
+        self.sequence: int = 0
+        self.history: deque[tuple[int, str, dict]] = deque(maxlen=history_size)
+        self.buffer_size = buffer_size
+        self.subscribers: set[Subscriber] = set()
+
+    def event_id(self, sequence: int) -> str:
+        return f"{self.boot}-{sequence}"
+
+    def publish(self, event: str, data: dict) -> None:
+        with self.lock:
+            self.sequence += 1
+            entry = (self.sequence, event, data)
+            self.history.append(entry)
+
+            for subscriber in list(self.subscribers):
+                try:
+                    subscriber.queue.put_nowait(entry)
+                except queue.Full:
+                    # The stream is closed once the buffer drains; the client reconnects with
+                    # Last-Event-ID and catches up from the history
+                    subscriber.overflowed = True
+                    self.subscribers.discard(subscriber)
+
+    def subscribe(self, last_event_id: str | None) -> tuple[Subscriber, list[tuple[int, str, dict]], bool]:
+        # Returns the subscriber, the events to replay, and whether the client missed events
+        # that are no longer in the history and has to reload its data
+        subscriber = Subscriber(self.buffer_size)
+        with self.lock:
+            self.subscribers.add(subscriber)
+            if not last_event_id:
+                return subscriber, [], False
+
+            boot, _, sequence = last_event_id.partition("-")
+            if boot != self.boot or not sequence.isdigit() or int(sequence) > self.sequence:
+                return subscriber, [], True
+
+            last_sequence = int(sequence)
+            replay = [entry for entry in self.history if entry[0] > last_sequence]
+            oldest = self.history[0][0] if self.history else self.sequence + 1
+            return subscriber, replay, oldest > last_sequence + 1
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self.lock:
+            self.subscribers.discard(subscriber)
@@ -1,29 +1,341 @@
+import itertools
 import os
+import re
+import threading
+import time
 
 import mysql.connector
 from dotenv import load_dotenv
+from mysql.connector import errorcode, pooling
 
+from utils import sqlite_backend
+from utils.deadline import DeadlineCursor
+from utils.query_cache import CachingCursor, QueryCache
 
-class Database:
-    def __init__(self, database_name: str | None = None):
-        load_dotenv(override=True)
-        if database_name is None:
-            database_name = os.getenv("DB_NAME")
+load_dotenv(override=True)
+
+# "mysql" (default) or "sqlite" for the embedded engine in utils/sqlite_backend.py
+DB_BACKEND: str = os.getenv("DB_BACKEND", "mysql")
+
+# Database file for the sqlite backend; other database names get "<name>.sqlite3" next to it
+SQLITE_PATH: str = os.getenv("DB_SQLITE_PATH", "fit_lohas.sqlite3")
+
+# Connection pool size per endpoint (mysql.connector caps this at 32)
+POOL_SIZE: int = min(int(os.getenv("DB_POOL_SIZE", "5")), pooling.CNX_POOL_MAXSIZE)
+
+# Read replicas as a comma separated list of host[:port], e.g. "127.0.0.1:3307,127.0.0.1:3308"
+REPLICA_HOSTS: list[str] = [host.strip() for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host.strip()]
+
+# Seconds after a user's own write during which their reads stay on the primary
+STICKY_SECONDS: float = float(os.getenv("DB_STICKY_SECONDS", "5"))
+
+# Replicas lagging more than this many seconds are taken out of rotation
+REPLICA_MAX_LAG: float = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+
+# How often a background thread checks each replica's lag, and how long a bad replica stays out of rotation
+REPLICA_CHECK_INTERVAL: float = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "2"))
+REPLICA_RETRY_SECONDS: float = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+
+# Socket timeout for MySQL connections, a backstop for statements MAX_EXECUTION_TIME does not cover
+CONNECTION_TIMEOUT: int = int(os.getenv("DB_CONNECTION_TIMEOUT", "30"))
+
+# Seconds MySQL waits on a slow export download before it drops the stream (net_write_timeout)
+STREAM_WRITE_TIMEOUT: int = int(os.getenv("DB_STREAM_WRITE_TIMEOUT", "3600"))
+
+# Opt-in cache of SELECT results shared by every Database instance in the process
+QUERY_CACHE_ENABLED: bool = os.getenv("DB_QUERY_CACHE", "0") == "1"
+query_cache = QueryCache(
+    max_bytes=int(os.getenv("DB_QUERY_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    ttl=float(os.getenv("DB_QUERY_CACHE_TTL", "30")),
+)
+
+
+class Endpoint:
+    def __init__(self, host: str, port: str, database_name: str):
         self.db_config = {
-            "host": os.getenv("DB_HOST"),
+            "host": host,
             "user": os.getenv("DB_USER"),
             "password": os.getenv("DB_PASS"),
-            "port": os.getenv("DB_PORT"),
+            "port": port,
             "database": database_name,
+            # Drop unread rows (e.g. fetchone on a multi-row result) before the connection is reused
+            "consume_results": True,
+            "connection_timeout": CONNECTION_TIMEOUT,
         }
-        self.conn = mysql.connector.connect(**self.db_config)
-        self.cursor = self.conn.cursor()
+        self.pool: pooling.MySQLConnectionPool | None = None
+        self.pool_lock = threading.Lock()
+        # Replica health, kept up to date by the monitor thread so requests never wait for a check.
+        # A replica only serves reads once its first check has passed.
+        self.monitor_lock = threading.Lock()
+        self.monitor: threading.Thread | None = None
+        self.healthy: bool = False
+        self.down_until: float = 0.0
+        # "SHOW REPLICA STATUS" (MySQL 8.0.22+) or "SHOW SLAVE STATUS" (older servers, removed in 8.4)
+        self.status_statement: str = "SHOW REPLICA STATUS"
+
+    def get_connection(self):
+        with self.pool_lock:
+            if self.pool is None:
+                pool_name = re.sub(
+                    pooling.CNX_POOL_NAMEREGEX, "_", f"{self.db_config['host']}_{self.db_config['port']}"
+                )
+                self.pool = pooling.MySQLConnectionPool(
+                    pool_name=f"{pool_name}_{self.db_config['database']}"[:64],
+                    pool_size=POOL_SIZE,
+                    **self.db_config,
+                )
+        try:
+            return self.pool.get_connection()
+        except pooling.PoolError:
+            # Pool exhausted: fall back to a one-off connection rather than failing the request
+            return mysql.connector.connect(**self.db_config)
+
+    def mark_down(self):
+        self.healthy = False
+        self.down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+
+    def is_available(self) -> bool:
+        self.start_monitor()
+        return self.healthy
+
+    def start_monitor(self):
+        if self.monitor is not None:
+            return
+        with self.monitor_lock:
+            if self.monitor is None:
+                self.monitor = threading.Thread(target=self.run_monitor, daemon=True)
+                self.monitor.start()
+
+    def run_monitor(self):
+        while True:
+            # A replica taken out of rotation is left alone until its retry time
+            if time.monotonic() >= self.down_until:
+                self.check_lag()
+            time.sleep(REPLICA_CHECK_INTERVAL)
+
+    def read_replica_status(self, conn) -> dict | None:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            try:
+                cursor.execute(self.status_statement)
+            except mysql.connector.Error as err:
+                # Servers before 8.0.22 only know the old statement
+                if err.errno != errorcode.ER_PARSE_ERROR or self.status_statement == "SHOW SLAVE STATUS":
+                    raise
+                self.status_statement = "SHOW SLAVE STATUS"
+                cursor.execute(self.status_statement)
+            return cursor.fetchone()  # type: ignore
+        finally:
+            cursor.close()
+
+    def check_lag(self):
+        conn = None
+        try:
+            conn = self.get_connection()
+            status = self.read_replica_status(conn)
+            if status is None:
+                # Not configured as a replica at all
+                self.mark_down()
+                return
+            lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+            # A NULL lag means the replication threads are not running
+            if lag is None or lag > REPLICA_MAX_LAG:
+                print(f"Replica {self.db_config['host']}:{self.db_config['port']} out of rotation, lag: {lag}")
+                self.mark_down()
+                return
+            self.healthy = True
+        except mysql.connector.Error as err:
+            print(f"Replica {self.db_config['host']}:{self.db_config['port']} out of rotation: {err}")
+            self.mark_down()
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+# Endpoints are shared by every Database instance in the process, keyed by (host, port, database)
+_endpoints: dict[tuple[str, str, str], Endpoint] = {}
+_endpoints_lock = threading.Lock()
+_replica_counter = itertools.count()
+
+# user id -> time.monotonic() of the user's last committed write
+_last_write: dict[str, float] = {}
+
+
+def _get_endpoint(host: str, port: str, database_name: str) -> Endpoint:
+    key = (host, port, database_name)
+    with _endpoints_lock:
+        if key not in _endpoints:
+            _endpoints[key] = Endpoint(host, port, database_name)
+        return _endpoints[key]
+
+
+def _get_replicas(database_name: str) -> list[Endpoint]:
+    replicas = []
+    for replica_host in REPLICA_HOSTS:
+        host, _, port = replica_host.partition(":")
+        replicas.append(_get_endpoint(host, port or os.getenv("DB_PORT", "3306"), database_name))
+    if not replicas:
+        return replicas
+    # Round-robin over the replicas, starting from a different one on every call
+    start = next(_replica_counter) % len(replicas)
+    return replicas[start:] + replicas[:start]
+
+
+def record_write(user_id) -> None:
+    if user_id is None:
+        return
+    now = time.monotonic()
+    _last_write[str(user_id)] = now
+    if len(_last_write) > 10000:
+        for key, written_at in list(_last_write.items()):
+            if now - written_at > STICKY_SECONDS:
+                _last_write.pop(key, None)
+
+
+def is_sticky(user_id) -> bool:
+    if user_id is None:
+        return False
+    written_at = _last_write.get(str(user_id))
+    return written_at is not None and time.monotonic() - written_at < STICKY_SECONDS
+
+
+def _kill_connection(db_config: dict, connection_id: int) -> None:
+    # KILL needs a second connection; a user may always kill its own connections
+    conn = None
+    try:
+        conn = mysql.connector.connect(**db_config)
+        cursor = conn.cursor()
+        cursor.execute(f"KILL {int(connection_id)}")
+        cursor.close()
+    except mysql.connector.Error as err:
+        print(f"Error at _kill_connection: {err}")
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+class MySQLBackend:
+    name = "mysql"
+
+    def connect(self, database_name: str, read_only: bool, user_id) -> tuple:
+        # Returns (connection, db_config, whether the connection is to a replica).
+        # Read-only work goes to a healthy replica, unless the user has just written something
+        if read_only and not is_sticky(user_id):
+            for replica in _get_replicas(database_name):
+                if not replica.is_available():
+                    continue
+                try:
+                    return replica.get_connection(), replica.db_config, True
+                except mysql.connector.Error as err:
+                    print(f"Replica {replica.db_config['host']}:{replica.db_config['port']} out of rotation: {err}")
+                    replica.mark_down()
+
+        # Writes, sticky reads and reads without a healthy replica go to the primary
+        primary = _get_endpoint(os.getenv("DB_HOST"), os.getenv("DB_PORT"), database_name)  # type: ignore
+        return primary.get_connection(), primary.db_config, False
+
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    def connect(self, database_name: str, read_only: bool, user_id) -> tuple:
+        # A single embedded file, so there is no read/write split
+        path = SQLITE_PATH
+        if database_name != os.getenv("DB_NAME"):
+            path = os.path.join(os.path.dirname(SQLITE_PATH), f"{database_name}.sqlite3")
+        return sqlite_backend.connect(path, create_schema=path == SQLITE_PATH), {"database": path}, False
+
+
+BACKENDS = {"mysql": MySQLBackend, "sqlite": SQLiteBackend}
+backend = BACKENDS[DB_BACKEND]()
+
+
+class Database:
+    def __init__(self, database_name: str | None = None, read_only: bool = False, user_id=None):
+        if database_name is None:
+            database_name = os.getenv("DB_NAME")
+        self.user_id = user_id
+        self.backend: str = backend.name
+        self.conn = None
+        self.cursor = None
+
+        sticky: bool = is_sticky(user_id)
+        self.conn, self.db_config, replica = backend.connect(database_name, read_only, user_id)  # type: ignore
+        # Rows read from a replica may be older than the cache entries and are never stored. Right after
+        # a user's own write their reads skip the cache as well, just like they skip the replicas.
+        self.cursor = CachingCursor(
+            DeadlineCursor(self.conn.cursor(), self.backend),
+            query_cache if QUERY_CACHE_ENABLED else None,
+            database_name,  # type: ignore
+            serve_cached=not sticky,
+            store_results=not replica,
+        )
+
+    def stream(self, query: str, values: tuple = (), batch_size: int = 1000):
+        # Rows are pulled from the server in batches through an unbuffered cursor,
+        # so the whole result set never sits in memory at once
+        if self.backend != "mysql":
+            return self._stream_cursor(query, values, batch_size)
+
+        # MySQL streams on a connection of its own. Closing a cursor or returning a connection to the
+        # pool reads and discards every unread row first, so when the consumer stops early (e.g. a
+        # client aborts a download) the connection is killed on the server instead. The pooled
+        # connection goes back to the pool right away rather than sitting idle for the whole download.
+        self.close()
+        return self._stream_mysql(query, values, batch_size)
+
+    def _stream_cursor(self, query: str, values: tuple, batch_size: int):
+        cursor = self.conn.cursor(buffered=False)  # type: ignore
+        try:
+            yield from self._fetch_batches(cursor, query, values, batch_size)
+        finally:
+            cursor.close()
+
+    def _stream_mysql(self, query: str, values: tuple, batch_size: int):
+        conn = mysql.connector.connect(**self.db_config)
+        finished = False
+        try:
+            cursor = conn.cursor(buffered=False)
+            # A slow client stalls the stream, the server's default net_write_timeout is 60s
+            cursor.execute(f"SET SESSION net_write_timeout = {int(STREAM_WRITE_TIMEOUT)}")
+            yield from self._fetch_batches(cursor, query, values, batch_size)
+            finished = True
+            cursor.close()
+        finally:
+            if not finished:
+                _kill_connection(self.db_config, conn.connection_id)  # type: ignore
+            try:
+                conn.close()
+            except mysql.connector.Error:
+                pass  # already killed
+
+    @staticmethod
+    def _fetch_batches(cursor, query: str, values: tuple, batch_size: int):
+        cursor.execute(query, values)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+    def commit(self):
+        self.conn.commit()  # type: ignore
+        record_write(self.user_id)
+        self.cursor.committed()  # type: ignore
+
+    def close(self):
+        try:
+            if self.cursor:
+                self.cursor.close()
+        finally:
+            # Pooled connections are returned to their pool instead of being closed
+            if self.conn:
+                self.conn.close()
+            self.cursor = None
+            self.conn = None
 
     def __del__(self):
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
+        self.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,92 @@
+import re
+import sqlite3
+import time
+
+import mysql.connector
+from flask import g, has_app_context
+
+# Error MySQL raises when a SELECT runs past its MAX_EXECUTION_TIME (ER_QUERY_TIMEOUT)
+ER_QUERY_TIMEOUT = 3024
+
+# The SQLite progress handler is called every this many virtual machine instructions
+SQLITE_PROGRESS_STEPS = 1000
+
+SELECT_RE = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def start(seconds: float | None) -> None:
+    # Batch sub-requests are dispatched inside the batch's app context and keep its deadline
+    if seconds is None or g.get("deadline") is not None:
+        return
+    g.deadline = time.monotonic() + seconds
+
+
+def remaining() -> float | None:
+    # Seconds left for the current request, None outside of requests or without a deadline
+    if not has_app_context():
+        return None
+    deadline = g.get("deadline")
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def is_expired() -> bool:
+    budget = remaining()
+    return budget is not None and budget <= 0
+
+
+def expired() -> DeadlineExceeded:
+    # Handlers catch Exception and answer 500, the flag lets after_request turn that into a 504
+    g.deadline_exceeded = True
+    return DeadlineExceeded("Request deadline exceeded")
+
+
+class DeadlineCursor:
+    # Wraps a DB-API cursor so no statement outlives the request deadline. No statement is started
+    # once the budget is spent; MySQL SELECTs carry the remaining budget as a MAX_EXECUTION_TIME hint
+    # and SQLite statements are interrupted by a progress handler. Both end in DeadlineExceeded.
+    def __init__(self, cursor, backend: str):
+        self.cursor = cursor
+        self.backend = backend
+        if backend == "sqlite":
+            cursor.connection.set_progress_handler(is_expired, SQLITE_PROGRESS_STEPS)
+
+    def execute(self, query: str, params=None):
+        budget = remaining()
+        if budget is None:
+            return self.cursor.execute(query, params)
+        if budget <= 0:
+            raise expired()
+        if self.backend == "mysql":
+            match = SELECT_RE.match(query)
+            if match:
+                hint = f" /*+ MAX_EXECUTION_TIME({max(1, int(budget * 1000))}) */"
+                query = query[: match.end()] + hint + query[match.end() :]
+        return self._run(self.cursor.execute, query, params)
+
+    def fetchone(self):
+        return self._run(self.cursor.fetchone)
+
+    def fetchmany(self, size: int = 1):
+        return self._run(self.cursor.fetchmany, size)
+
+    def fetchall(self):
+        return self._run(self.cursor.fetchall)
+
+    def _run(self, function, *args):
+        # Rows of an unbuffered MySQL result are read on fetch, so the timeout can surface there too
+        try:
+            return function(*args)
+        except (mysql.connector.Error, sqlite3.OperationalError) as err:
+            if getattr(err, "errno", None) == ER_QUERY_TIMEOUT or is_expired():
+                raise expired() from err
+            raise
+
+    def __getattr__(self, name: str):
+        # description, rowcount, lastrowid, close, ... come from the wrapped cursor
+        return getattr(self.cursor, name)
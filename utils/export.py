@@ -0,0 +1,105 @@
+import csv
+import io
+import zlib
+from typing import Callable, Iterable, Iterator
+
+# Flush the output buffer to the client roughly every 64 KiB
+CHUNK_SIZE: int = 64 * 1024
+
+# Export name -> (query, column names). Queries are plain SELECTs, which InnoDB runs as
+# non-locking consistent reads, and avoid ORDER BY on anything but the primary key so
+# MySQL can start sending rows without sorting the whole table first.
+EXPORTS: dict[str, tuple[str, list[str]]] = {
+    "users": (
+        """
+        SELECT UserID, Username, Email, AvatarPath, FullName, UserRole,
+        PhoneNumber, Address, Gender, CreatedDate, ModifyDate
+        FROM users ORDER BY UserID
+        """,
+        [
+            "id",
+            "username",
+            "email",
+            "avatar",
+            "fullname",
+            "role",
+            "phone",
+            "address",
+            "gender",
+            "created_date",
+            "modify_date",
+        ],
+    ),
+    "courses": (
+        """
+        SELECT CourseID, CourseName, CourseDescription, Category, TeacherID, CreatedDate, ModifyDate
+        FROM courses ORDER BY CourseID
+        """,
+        ["id", "name", "description", "category", "teacher_id", "created_date", "modify_date"],
+    ),
+    "enrollments": (
+        """
+        SELECT ce.CourseID, c.CourseName, c.Category, ce.UserID, u.Username, u.FullName, ce.CreatedDate
+        FROM CourseEnter ce
+        INNER JOIN courses c ON ce.CourseID = c.CourseID
+        INNER JOIN users u ON ce.UserID = u.UserID
+        """,
+        ["course_id", "course_name", "category", "user_id", "username", "fullname", "entered_date"],
+    ),
+}
+
+FORMATS: dict[str, str] = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def csv_chunks(columns: list[str], rows: Iterable[tuple]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def ndjson_chunks(columns: list[str], rows: Iterable[tuple], dumps: Callable[..., str]) -> Iterator[bytes]:
+    lines: list[str] = []
+    size = 0
+    for row in rows:
+        line = dumps(dict(zip(columns, row)), separators=(",", ":"))
+        lines.append(line)
+        size += len(line) + 1
+        if size >= CHUNK_SIZE:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+            size = 0
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_chunks(
+    name: str, export_format: str, rows: Iterable[tuple], dumps: Callable[..., str], gzip: bool = False
+) -> Iterator[bytes]:
+    columns = EXPORTS[name][1]
+    if export_format == "csv":
+        chunks = csv_chunks(columns, rows)
+    else:
+        chunks = ndjson_chunks(columns, rows, dumps)
+    if gzip:
+        chunks = gzip_chunks(chunks)
+    return chunks
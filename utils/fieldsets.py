@@ -0,0 +1,80 @@
+from typing import Mapping
+
+# API field name -> SQL column for each resource returned by the list endpoints
+USER_FIELDS: dict[str, str] = {
+    "id": "UserID",
+    "username": "Username",
+    "name": "Username",
+    "email": "Email",
+    "avatar": "AvatarPath",
+    "fullname": "FullName",
+    "role": "UserRole",
+    "phone": "PhoneNumber",
+    "address": "Address",
+    "gender": "Gender",
+    "created_date": "CreatedDate",
+    "modify_date": "ModifyDate",
+}
+
+TEACHER_FIELDS: dict[str, str] = {
+    "id": "teachers.TeacherID",
+    "userid": "users.UserID",
+    **{field: f"users.{column}" for field, column in USER_FIELDS.items() if field != "id"},
+    "salary": "teachers.Salary",
+}
+
+COURSE_FIELDS: dict[str, str] = {
+    "id": "CourseID",
+    "name": "CourseName",
+    "description": "CourseDescription",
+    "category": "Category",
+    "teacher_id": "TeacherID",
+    "created_date": "CreatedDate",
+    "modify_date": "ModifyDate",
+}
+
+# Courses joined with CourseEnter or teachers, where column names have to be qualified
+JOINED_COURSE_FIELDS: dict[str, str] = {
+    **{field: f"c.{column}" for field, column in COURSE_FIELDS.items()},
+    "entered_students_count": "(SELECT COUNT(*) FROM CourseEnter e WHERE e.CourseID = c.CourseID)",
+}
+
+
+class Fieldset:
+    # Parses ?fields=a,b,c and ?include=relation for a list endpoint.
+    #   neither given  -> every field and every nested relation (the full response)
+    #   fields=...     -> only the listed fields; relations are loaded if listed in fields or include
+    #   include=...    -> every field plus only the listed relations (include= loads none)
+    def __init__(self, columns: dict[str, str], args: Mapping[str, str], relations: tuple[str, ...] = ()):
+        self.columns = columns
+        fields_param: str | None = args.get("fields")
+        include_param: str | None = args.get("include")
+
+        if fields_param is None and include_param is None:
+            self.fields: list[str] = list(columns)
+            self.relations: set[str] = set(relations)
+            return
+
+        requested = [field.strip() for field in (fields_param or "").split(",") if field.strip()]
+        included = {relation.strip() for relation in (include_param or "").split(",") if relation.strip()}
+        for name in requested:
+            if name not in columns and name not in relations:
+                raise ValueError(f"Unknown field: {name}")
+        for name in included:
+            if name not in relations:
+                raise ValueError(f"Unknown relation: {name}")
+
+        if fields_param is None:
+            self.fields = list(columns)
+        else:
+            self.fields = list(dict.fromkeys(field for field in requested if field in columns))
+        self.relations = included | {field for field in requested if field in relations}
+        if not self.fields and not self.relations:
+            raise ValueError("No fields requested")
+
+    def select(self, *extra_columns: str) -> str:
+        # Extra columns (e.g. keys needed to load relations) are appended after the requested ones
+        return ", ".join([self.columns[field] for field in self.fields] + list(extra_columns))
+
+    def to_dict(self, row: tuple) -> dict:
+        return dict(zip(self.fields, row))
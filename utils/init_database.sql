@@ -168,3 +168,27 @@ CREATE TABLE CourseEnter (
 INSERT INTO CourseEnter (CourseID, UserID)
 VALUES (1, 4), (2, 4), (3, 5);
 
+-- Indexes for the per-user course lookups (/api/student/courses and /api/teacher/courses)
+CREATE INDEX idx_courseenter_user ON CourseEnter (UserID, CourseID);
+CREATE INDEX idx_courses_teacher ON courses (TeacherID, CourseID);
+CREATE INDEX idx_teachers_user ON teachers (UserID);
+
+-- Background jobs run by utils/jobs.py (Status: queued, running, done, failed)
+CREATE TABLE jobs (
+    JobID INT AUTO_INCREMENT PRIMARY KEY,
+    JobType VARCHAR(50) NOT NULL,
+    Payload LONGTEXT NOT NULL,
+    Status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    Progress INT NOT NULL DEFAULT 0,
+    Result LONGTEXT,
+    Error TEXT,
+    -- Process that runs the job, it renews LeaseExpires while it is alive
+    Owner VARCHAR(100),
+    LeaseExpires TIMESTAMP NULL DEFAULT NULL,
+    CreatedBy INT,
+    CreatedDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ModifyDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (CreatedBy) REFERENCES users(UserID)
+);
+CREATE INDEX idx_jobs_status ON jobs (Status, JobID);
+
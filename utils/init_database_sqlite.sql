@@ -0,0 +1,223 @@
+-- SQLite port of init_database.sql, used when DB_BACKEND="sqlite".
+-- Text columns use COLLATE NOCASE to match the case-insensitive MySQL collation,
+-- and the ON UPDATE CURRENT_TIMESTAMP columns are maintained by triggers.
+
+-- Create table users
+CREATE TABLE users (
+    UserID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Username VARCHAR(50) NOT NULL COLLATE NOCASE,
+    Email VARCHAR(100) UNIQUE NOT NULL COLLATE NOCASE,
+    PasswordHash VARCHAR(200) NOT NULL,
+    AvatarPath VARCHAR(200) DEFAULT '/assets/images/avatars/000-default.png ',
+    FullName VARCHAR(100) COLLATE NOCASE,
+    UserRole VARCHAR(50) DEFAULT 'STUDENT' COLLATE NOCASE,
+    PhoneNumber VARCHAR(20),
+    Address VARCHAR(200) COLLATE NOCASE,
+    Gender VARCHAR(6) CHECK (Gender IN ('Male', 'Female', 'Other')) COLLATE NOCASE,
+    CreatedDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ModifyDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TRIGGER users_modify_date AFTER UPDATE ON users
+WHEN NEW.ModifyDate IS OLD.ModifyDate
+BEGIN
+    UPDATE users SET ModifyDate = CURRENT_TIMESTAMP WHERE UserID = NEW.UserID;
+END;
+
+-- Insert data into table users
+INSERT INTO users (
+    UserID,
+    Username, 
+    Email, 
+    PasswordHash, 
+    AvatarPath, 
+    FullName, 
+    UserRole, 
+    Address, 
+    Gender
+) VALUES (
+    1,
+    'admin', 
+    'admin@gmail.com', 
+    '9e37a8d2e30bb3c7a36f2e1646c0154c835f56175307445146b9bb0f80fdb1d6',  -- Password: dummyPass
+    '/assets/images/face-0.png', 
+    'Super user', 
+    'ADMIN', 
+    'Taiwan NCHU', 
+    'Male'
+);
+
+INSERT INTO users(
+    UserID,
+    Username,
+    Email,
+    PasswordHash,
+    UserRole
+) VALUES (
+    2,
+    'teacher01', 
+    'teacher01@gmail.com',
+    '9e37a8d2e30bb3c7a36f2e1646c0154c835f56175307445146b9bb0f80fdb1d6',  -- Password: dummyPass
+    'TEACHER'
+),
+( 
+    3,
+    'teacher02', 
+    'teacher02@gmail.com',
+    '9e37a8d2e30bb3c7a36f2e1646c0154c835f56175307445146b9bb0f80fdb1d6',  -- Password: dummyPass
+    'TEACHER'
+);
+
+INSERT INTO users(
+    UserID,
+    Username,
+    Email,
+    PasswordHash
+) VALUES ( 
+    4,
+    'student01', 
+    'student01@gmail.com',
+    '9e37a8d2e30bb3c7a36f2e1646c0154c835f56175307445146b9bb0f80fdb1d6'  -- Password: dummyPass
+),
+(
+    5,
+    'student02', 
+    'student02@gmail.com',
+    '9e37a8d2e30bb3c7a36f2e1646c0154c835f56175307445146b9bb0f80fdb1d6'  -- Password: dummyPass
+);
+
+-- Create table teachers, where UserID is a foreign key referencing to UserID in table users
+CREATE TABLE teachers (
+    TeacherID INTEGER PRIMARY KEY AUTOINCREMENT,
+    UserID INT,
+    Salary DECIMAL(10, 2),
+    CreatedDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ModifyDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (UserID) REFERENCES users(UserID)
+);
+
+CREATE TRIGGER teachers_modify_date AFTER UPDATE ON teachers
+WHEN NEW.ModifyDate IS OLD.ModifyDate
+BEGIN
+    UPDATE teachers SET ModifyDate = CURRENT_TIMESTAMP WHERE TeacherID = NEW.TeacherID;
+END;
+
+-- Insert data into table teachers
+INSERT INTO teachers (
+    UserID, 
+    Salary
+) VALUES (
+    2, 
+    100000
+),
+(
+    3, 
+    200000
+);
+
+-- Create table courses
+CREATE TABLE courses (
+    CourseID INTEGER PRIMARY KEY AUTOINCREMENT,
+    CourseName VARCHAR(100) NOT NULL COLLATE NOCASE,
+    CourseDescription VARCHAR(200) NOT NULL COLLATE NOCASE,
+    Category VARCHAR(50) COLLATE NOCASE,
+    TeacherID INT,
+    CreatedDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ModifyDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (TeacherID) REFERENCES teachers(TeacherID)
+);
+
+CREATE TRIGGER courses_modify_date AFTER UPDATE ON courses
+WHEN NEW.ModifyDate IS OLD.ModifyDate
+BEGIN
+    UPDATE courses SET ModifyDate = CURRENT_TIMESTAMP WHERE CourseID = NEW.CourseID;
+END;
+
+-- Inserting course 1: Cardio Kickboxing
+INSERT INTO courses (CourseName, CourseDescription, Category, TeacherID)
+VALUES (
+    'Cardio Kickboxing',
+    'High-energy workout combining martial arts techniques and heart-pumping cardio.',
+    'Kickboxing',
+    1
+),
+(
+    'Strength Training 101',
+    'Introduction to basic strength exercises focusing on building muscle and strength.',
+    'Strength Training',
+    2
+),
+(
+    'Yoga for Flexibility',
+    'Gentle yoga practice aimed at improving flexibility and reducing stress.',
+    'Yoga',
+    2
+),
+(
+    'Advanced Kickboxing Techniques',
+    'Advanced techniques and combinations for experienced practitioners.',
+    'Kickboxing',
+    1
+),
+(
+    'Powerlifting Essentials',
+    'Focus on powerlifting exercises for building maximum strength.',
+    'Strength Training',
+    2
+),
+(
+    'Mindful Meditation through Yoga',
+    'Learn mindfulness and meditation practices through yoga poses.',
+    'Yoga',
+    2
+);
+
+-- CourseEnter (CourseID, UserID, CreatedDate, ModifyDate)
+CREATE TABLE CourseEnter (
+    CourseID INT,
+    UserID INT,
+    CreatedDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ModifyDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (CourseID) REFERENCES courses(CourseID),
+    FOREIGN KEY (UserID) REFERENCES users(UserID),
+    PRIMARY KEY (CourseID, UserID)
+) WITHOUT ROWID;
+
+CREATE TRIGGER courseenter_modify_date AFTER UPDATE ON CourseEnter
+WHEN NEW.ModifyDate IS OLD.ModifyDate
+BEGIN
+    UPDATE CourseEnter SET ModifyDate = CURRENT_TIMESTAMP WHERE CourseID = NEW.CourseID AND UserID = NEW.UserID;
+END;
+
+-- Inserting CourseEnter 1: Cardio Kickboxing
+INSERT INTO CourseEnter (CourseID, UserID)
+VALUES (1, 4), (2, 4), (3, 5);
+
+-- Indexes for the per-user course lookups (/api/student/courses and /api/teacher/courses)
+CREATE INDEX idx_courseenter_user ON CourseEnter (UserID, CourseID);
+CREATE INDEX idx_courses_teacher ON courses (TeacherID, CourseID);
+CREATE INDEX idx_teachers_user ON teachers (UserID);
+
+-- Background jobs run by utils/jobs.py (Status: queued, running, done, failed)
+CREATE TABLE jobs (
+    JobID INTEGER PRIMARY KEY AUTOINCREMENT,
+    JobType VARCHAR(50) NOT NULL,
+    Payload TEXT NOT NULL,
+    Status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    Progress INT NOT NULL DEFAULT 0,
+    Result TEXT,
+    Error TEXT,
+    -- Process that runs the job, it renews LeaseExpires while it is alive
+    Owner VARCHAR(100),
+    LeaseExpires TIMESTAMP NULL DEFAULT NULL,
+    CreatedBy INT,
+    CreatedDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ModifyDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (CreatedBy) REFERENCES users(UserID)
+);
+CREATE TRIGGER jobs_modify_date AFTER UPDATE ON jobs
+WHEN NEW.ModifyDate IS OLD.ModifyDate
+BEGIN
+    UPDATE jobs SET ModifyDate = CURRENT_TIMESTAMP WHERE JobID = NEW.JobID;
+END;
+CREATE INDEX idx_jobs_status ON jobs (Status, JobID);
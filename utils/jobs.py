@@ -0,0 +1,253 @@
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable
+
+from utils.database import Database
+
+# Values of jobs.Status
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JOB_COLUMNS = "JobID, JobType, Status, Progress, Result, Error, CreatedBy, CreatedDate, ModifyDate"
+
+
+def to_dict(row: tuple) -> dict:
+    return {
+        "id": row[0],
+        "type": row[1],
+        "status": row[2],
+        "progress": row[3],
+        "result": json.loads(row[4]) if row[4] else None,
+        "error": row[5],
+        "created_by": row[6],
+        "created_date": row[7],
+        "modify_date": row[8],
+    }
+
+
+class Job:
+    # Handed to the job function, which reads its payload and reports progress through it
+    def __init__(self, job_id: int, payload: dict, owner: str):
+        self.id = job_id
+        self.payload = payload
+        self.owner = owner
+        self.last_progress: int = 0
+
+    def progress(self, percent: float) -> None:
+        # 100 is only reported once the result is stored
+        percent = min(max(int(percent), 0), 99)
+        if percent == self.last_progress:
+            return
+        self.last_progress = percent
+        db = Database()
+        try:
+            db.cursor.execute(
+                "UPDATE jobs SET Progress = %s WHERE JobID = %s AND Owner = %s", (percent, self.id, self.owner)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+
+class JobQueue:
+    # In-process worker pool for slow admin operations, so they do not hold a request worker.
+    # Every job is a row in the jobs table: its status and progress can be polled from any process
+    # and survive restarts.
+    #
+    # Each process owns the jobs it queued or took over and holds a lease on them, renewed by a
+    # heartbeat thread every third of lease_seconds. When a process stops, its leases run out and
+    # another process (or the restarted one) queues those jobs again; interrupted jobs then run
+    # from the start, so job functions must be safe to re-run. A job is only claimed by its owner,
+    # so it never runs in two processes at once.
+    def __init__(self, workers: int, lease_seconds: float):
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.owner: str = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"[:100]
+        self.functions: dict[str, Callable[[Job], dict | None]] = {}
+        self.queue: queue.Queue[int] = queue.Queue()
+        self.lock = threading.Lock()
+        self.started = False
+
+    def register(self, job_type: str):
+        def decorator(function: Callable[[Job], dict | None]):
+            self.functions[job_type] = function
+            return function
+
+        return decorator
+
+    def start(self) -> None:
+        with self.lock:
+            if self.started:
+                return
+            self.take_over_expired()
+            for _ in range(self.workers):
+                threading.Thread(target=self.run, daemon=True).start()
+            threading.Thread(target=self.heartbeat, daemon=True).start()
+            self.started = True
+
+    def lease_expires(self) -> datetime:
+        return datetime.now() + timedelta(seconds=self.lease_seconds)
+
+    def heartbeat(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                db = Database()
+                try:
+                    db.cursor.execute(
+                        "UPDATE jobs SET LeaseExpires = %s WHERE Owner = %s AND Status IN (%s, %s)",
+                        (self.lease_expires(), self.owner, QUEUED, RUNNING),
+                    )
+                    db.commit()
+                finally:
+                    db.close()
+                self.take_over_expired()
+            except Exception:
+                print("Error at job heartbeat: " + traceback.format_exc())
+
+    def take_over_expired(self) -> None:
+        # Queued or running jobs whose owner stopped renewing the lease are queued again here
+        db = Database()
+        try:
+            now = datetime.now()
+            db.cursor.execute(
+                """
+                SELECT JobID FROM jobs
+                WHERE Status IN (%s, %s) AND (LeaseExpires IS NULL OR LeaseExpires < %s)
+                ORDER BY JobID
+                """,
+                (QUEUED, RUNNING, now),
+                cache=False,
+            )
+            rows: list[tuple] = db.cursor.fetchall()  # type: ignore
+            taken: list[int] = []
+            for (job_id,) in rows:
+                # Re-checked per job, another process may be taking over the same jobs
+                db.cursor.execute(
+                    """
+                    UPDATE jobs SET Status = %s, Progress = 0, Owner = %s, LeaseExpires = %s
+                    WHERE JobID = %s AND Status IN (%s, %s) AND (LeaseExpires IS NULL OR LeaseExpires < %s)
+                    """,
+                    (QUEUED, self.owner, self.lease_expires(), job_id, QUEUED, RUNNING, now),
+                )
+                if db.cursor.rowcount == 1:
+                    taken.append(job_id)
+            db.commit()
+        finally:
+            db.close()
+        for job_id in taken:
+            self.queue.put(job_id)
+
+    def enqueue(self, job_type: str, payload: dict, user_id=None) -> int:
+        if job_type not in self.functions:
+            raise ValueError(f"Unknown job type: {job_type}")
+        self.start()
+        db = Database(user_id=user_id)
+        try:
+            db.cursor.execute(
+                "INSERT INTO jobs (JobType, Payload, CreatedBy, Owner, LeaseExpires) VALUES (%s, %s, %s, %s, %s)",
+                (job_type, json.dumps(payload), user_id, self.owner, self.lease_expires()),
+            )
+            job_id: int = db.cursor.lastrowid  # type: ignore
+            db.commit()
+        finally:
+            db.close()
+        self.queue.put(job_id)
+        return job_id
+
+    # Status is read from the primary, a replica may not have the job yet right after enqueue()
+    def get_job(self, job_id: int) -> dict | None:
+        db = Database()
+        try:
+            db.cursor.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE JobID = %s", (job_id,), cache=False)
+            row: tuple | None = db.cursor.fetchone()  # type: ignore
+        finally:
+            db.close()
+        return to_dict(row) if row else None
+
+    def list_jobs(self, limit: int, offset: int, status: str | None = None) -> tuple[list[dict], int]:
+        where: str = "WHERE Status = %s" if status else ""
+        values: tuple = (status,) if status else ()
+        db = Database()
+        try:
+            db.cursor.execute(f"SELECT COUNT(*) FROM jobs {where}", values, cache=False)
+            total_count: int = db.cursor.fetchone()[0]  # type: ignore
+            db.cursor.execute(
+                f"SELECT {JOB_COLUMNS} FROM jobs {where} ORDER BY JobID DESC LIMIT %s OFFSET %s",
+                values + (limit, offset),
+                cache=False,
+            )
+            rows: list[tuple] = db.cursor.fetchall()  # type: ignore
+        finally:
+            db.close()
+        return [to_dict(row) for row in rows], total_count
+
+    def run(self):
+        while True:
+            job_id = self.queue.get()
+            try:
+                self.execute(job_id)
+            except Exception:
+                print("Error at job " + str(job_id) + ": " + traceback.format_exc())
+
+    def execute(self, job_id: int) -> None:
+        db = Database()
+        try:
+            # Claim the job, a job that was queued twice only runs once
+            db.cursor.execute(
+                "UPDATE jobs SET Status = %s WHERE JobID = %s AND Status = %s AND Owner = %s",
+                (RUNNING, job_id, QUEUED, self.owner),
+            )
+            claimed: bool = db.cursor.rowcount == 1
+            db.cursor.execute("SELECT JobType, Payload FROM jobs WHERE JobID = %s", (job_id,), cache=False)
+            row: tuple | None = db.cursor.fetchone()  # type: ignore
+            db.commit()
+        finally:
+            db.close()
+        if not claimed or row is None:
+            return
+
+        job_type, payload = row
+        job = Job(job_id, json.loads(payload), self.owner)
+        result, error = None, None
+        try:
+            result = self.functions[job_type](job)
+            status, progress = DONE, 100
+        except Exception:
+            error = traceback.format_exc()
+            print("Error at job " + str(job_id) + ": " + error)
+            status, progress = FAILED, job.last_progress
+
+        try:
+            self.finish(job_id, status, progress, json.dumps(result) if result is not None else None, error)
+        except Exception:
+            # E.g. a result too large for the column. The job must not stay running with a live lease.
+            error = traceback.format_exc()
+            print("Error at job " + str(job_id) + ": " + error)
+            self.finish(job_id, FAILED, job.last_progress, None, "Could not store the job result:\n" + error)
+
+    def finish(self, job_id: int, status: str, progress: int, result: str | None, error: str | None) -> None:
+        db = Database()
+        try:
+            db.cursor.execute(
+                """
+                UPDATE jobs SET Status = %s, Progress = %s, Result = %s, Error = %s, LeaseExpires = NULL
+                WHERE JobID = %s AND Owner = %s
+                """,
+                (status, progress, result, error, job_id, self.owner),
+            )
+            db.commit()
+        except Exception:
+            db.conn.rollback()  # type: ignore
+            raise
+        finally:
+            db.close()
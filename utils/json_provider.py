@@ -0,0 +1,95 @@
+import typing as t
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson  # optional, pip install orjson
+except ImportError:
+    orjson = None
+
+_WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def http_date(value: date) -> str:
+    # Same output as werkzeug.http.http_date (used by Flask's default provider), without email.utils
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    elif value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return (
+        f"{_WEEKDAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month - 1]} {value.year:04d} "
+        f"{value.hour:02d}:{value.minute:02d}:{value.second:02d} GMT"
+    )
+
+
+def _default(o: t.Any) -> t.Any:
+    # CreatedDate/ModifyDate columns and teacher salaries, everything else is handled by Flask
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, Decimal):
+        return str(o)
+    return DefaultJSONProvider.default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    # Drop-in replacement for Flask's provider that encodes with orjson when it is installed.
+    # The output is byte-for-byte the same as the stdlib encoder; whenever orjson cannot
+    # guarantee that (non-ASCII text, unsupported arguments, integers beyond 64 bits, ...)
+    # the call falls back to DefaultJSONProvider. Floats are not used in our payloads and
+    # orjson formats exponents differently ("1e16" vs "1e+16").
+    default = staticmethod(_default)  # type: ignore
+
+    def _fast_dumps(self, obj: t.Any, kwargs: dict[str, t.Any]) -> bytes | None:
+        if orjson is None or set(kwargs) - {"indent", "separators"}:
+            return None
+
+        if kwargs.get("indent") == 2 and "separators" not in kwargs:
+            option = orjson.OPT_INDENT_2
+        elif kwargs.get("separators") == (",", ":") and "indent" not in kwargs:
+            option = 0
+        else:
+            return None
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+
+        try:
+            data: bytes = orjson.dumps(obj, default=self.default, option=option | orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            return None
+
+        # The stdlib encoder escapes non-ASCII characters and DEL, orjson writes them as is
+        if self.ensure_ascii and (not data.isascii() or b"\x7f" in data):
+            return None
+        return data
+
+    def dumps(self, obj: t.Any, **kwargs: t.Any) -> str:
+        data = self._fast_dumps(obj, kwargs)
+        if data is None:
+            return super().dumps(obj, **kwargs)
+        return data.decode()
+
+    def loads(self, s: str | bytes, **kwargs: t.Any) -> t.Any:
+        if orjson is not None and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                # e.g. NaN or integers beyond 64 bits, which the stdlib parser accepts
+                pass
+        return super().loads(s, **kwargs)
+
+    def response(self, *args: t.Any, **kwargs: t.Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            dump_args: dict[str, t.Any] = {"indent": 2}
+        else:
+            dump_args = {"separators": (",", ":")}
+
+        data = self._fast_dumps(obj, dump_args)
+        if data is None:
+            return super().response(*args, **kwargs)
+        # Skip the bytes -> str -> bytes round trip of the default provider
+        return self._app.response_class(data + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,194 @@
+import cProfile
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import Flask, Response, g, request
+
+from utils import auth
+
+# Nothing is registered on the app unless PROFILING_ENABLED="1", so there is no per-request cost.
+# When enabled, a request is profiled if an admin sends "X-Profile: cprofile" or "X-Profile: sample",
+# or if it is picked at random with probability PROFILE_SAMPLE_RATE.
+PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SAMPLE_MODE: str = os.getenv("PROFILE_SAMPLE_MODE", "sample")
+PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLING_INTERVAL: float = float(os.getenv("PROFILE_SAMPLING_INTERVAL", "0.005"))
+
+MODES = ("cprofile", "sample")
+
+# Frames are attributed to the database or to JSON encoding by their file or function name;
+# everything else counts as Python. Socket reads only happen inside the MySQL client here.
+DB_MARKERS = ("mysql", "sqlite", "_socket", "database.py")
+JSON_MARKERS = ("json",)
+
+
+def classify(label: str) -> str | None:
+    lowered = label.lower()
+    if any(marker in lowered for marker in DB_MARKERS):
+        return "db"
+    if any(marker in lowered for marker in JSON_MARKERS):
+        return "json"
+    return None
+
+
+class StackSampler:
+    # Samples one thread's stack every interval seconds from a background thread and counts
+    # identical stacks, which gives the folded format flamegraph.pl and speedscope read.
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+
+def _requested_mode() -> str | None:
+    mode = request.headers.get("X-Profile")
+    if mode:
+        try:
+            if mode in MODES and auth.verify_admin(request.headers.get("Authorization")):  # type: ignore
+                return mode
+        except Exception:
+            # An invalid token only means the request is not profiled; the route reports the error
+            pass
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return PROFILE_SAMPLE_MODE
+    return None
+
+
+def _start_profile():
+    # Batch sub-requests are dispatched inside the batch's app context, which is already profiled
+    if g.get("profile") is not None:
+        return
+    mode = _requested_mode()
+    if mode is None:
+        return
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = StackSampler(threading.get_ident(), PROFILE_SAMPLING_INTERVAL)
+        profiler.start()
+    g.profile = {"mode": mode, "profiler": profiler, "started": time.perf_counter(), "environ": request.environ}
+
+
+def _stop_profile() -> dict | None:
+    # Only the request that started the profile stops it, not the sub-requests dispatched within it
+    profile = g.get("profile")
+    if profile is None or profile["environ"] is not request.environ:
+        return None
+    g.pop("profile")
+    profiler = profile["profiler"]
+    if profile["mode"] == "cprofile":
+        profiler.disable()
+    else:
+        profiler.stop()
+    profile["wall"] = time.perf_counter() - profile["started"]
+    return profile
+
+
+def _attribute_cprofile(profiler: cProfile.Profile) -> dict[str, float]:
+    # Own time (tottime) per function, summed per category
+    totals = {"db": 0.0, "json": 0.0, "python": 0.0}
+    for (filename, _, function), (_, _, own_time, _, _) in pstats.Stats(profiler).stats.items():  # type: ignore
+        totals[classify(f"{filename} {function}") or "python"] += own_time
+    return totals
+
+
+def _attribute_samples(sampler: StackSampler, wall: float) -> dict[str, float]:
+    # A sample counts as database (or JSON) time when any frame on its stack belongs to it
+    counts = {"db": 0, "json": 0, "python": 0}
+    for stack, count in sampler.samples.items():
+        categories = {classify(frame) for frame in stack.split(";")}
+        category = "db" if "db" in categories else "json" if "json" in categories else "python"
+        counts[category] += count
+    total = sum(counts.values())
+    if total == 0:
+        return {"db": 0.0, "json": 0.0, "python": wall}
+    return {category: wall * count / total for category, count in counts.items()}
+
+
+def _save_profile(profile: dict, response: Response) -> None:
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint}-{uuid.uuid4().hex[:8]}"
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base_path = os.path.join(PROFILE_DIR, profile_id)
+
+    if profile["mode"] == "cprofile":
+        # Open with `python -m pstats` or snakeviz
+        profile["profiler"].dump_stats(base_path + ".prof")
+        timings = _attribute_cprofile(profile["profiler"])
+    else:
+        # Folded stacks: `flamegraph.pl profile.folded > profile.svg` or drop into speedscope
+        with open(base_path + ".folded", "w", encoding="utf-8") as folded_file:
+            for stack, count in profile["profiler"].samples.items():
+                folded_file.write(f"{stack} {count}\n")
+        timings = _attribute_samples(profile["profiler"], profile["wall"])
+
+    summary = {
+        "id": profile_id,
+        "mode": profile["mode"],
+        "method": request.method,
+        "path": request.full_path.rstrip("?"),
+        "endpoint": request.endpoint,
+        "status": response.status_code,
+        "wall_ms": round(profile["wall"] * 1000, 3),
+        **{f"{category}_ms": round(seconds * 1000, 3) for category, seconds in timings.items()},
+    }
+    with open(base_path + ".json", "w", encoding="utf-8") as summary_file:
+        json.dump(summary, summary_file, indent=2)
+
+    response.headers["X-Profile-Id"] = profile_id
+    response.headers["Server-Timing"] = ", ".join(
+        [f"{category};dur={seconds * 1000:.3f}" for category, seconds in timings.items()]
+        + [f"total;dur={profile['wall'] * 1000:.3f}"]
+    )
+
+
+def install(app: Flask) -> None:
+    if not PROFILING_ENABLED:
+        return
+
+    @app.before_request
+    def start_profile():
+        _start_profile()
+
+    @app.after_request
+    def save_profile(response: Response):
+        profile = _stop_profile()
+        if profile is not None:
+            try:
+                _save_profile(profile, response)
+            except Exception as err:
+                print(f"Error at save_profile: {err}")
+        return response
+
+    @app.teardown_request
+    def stop_profile(exception=None):
+        # after_request is skipped when a handler raises, make sure the profiler is stopped anyway
+        _stop_profile()
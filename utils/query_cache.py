@@ -0,0 +1,223 @@
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Tables a statement reads from (tables listed with commas after FROM are not recognised,
+# queries here use JOIN), and the table a write statement changes
+READ_TABLES_RE = re.compile(r"\b(?:FROM|JOIN)\s+`?(\w+)`?", re.IGNORECASE)
+WRITE_TABLE_RE = re.compile(
+    r"^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)`?", re.IGNORECASE
+)
+
+# SELECTs whose result depends on more than the table contents are never cached
+UNCACHEABLE_RE = re.compile(
+    r"\b(?:NOW|RAND|UUID|CURRENT_TIMESTAMP|CURRENT_DATE|SYSDATE|LAST_INSERT_ID"
+    r"|FOR\s+UPDATE|LOCK\s+IN\s+SHARE\s+MODE)\b",
+    re.IGNORECASE,
+)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split())
+
+
+def estimate_size(rows: list[tuple]) -> int:
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class QueryCache:
+    # LRU cache of SELECT results bounded by an estimate of their memory use.
+    # Every entry is tagged with the (lower-cased) tables it reads, so a write to a table
+    # drops exactly the entries that may have changed. Entries also expire after ttl seconds,
+    # which bounds staleness from writes made by other processes. Every invalidation bumps the
+    # version of its tables, so a result read while one of its tables was written is not stored.
+    def __init__(self, max_bytes: int, ttl: float):
+        self.lock = threading.Lock()
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size: int = 0
+        # key -> (rows, description, tables, size, expires_at)
+        self.entries: OrderedDict[tuple, tuple[list[tuple], tuple | None, set[str], int, float]] = OrderedDict()
+        self.keys_by_table: dict[str, set[tuple]] = {}
+        # table -> number of invalidations; generation counts the invalidations of everything
+        self.versions: dict[str, int] = {}
+        self.generation: int = 0
+
+    def get(self, key: tuple) -> tuple[list[tuple], tuple | None] | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[4] < time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def version(self, tables: set[str]) -> tuple:
+        # Taken before a SELECT runs and handed to put() with its rows
+        with self.lock:
+            return self._version(tables)
+
+    def _version(self, tables: set[str]) -> tuple:
+        return self.generation, tuple(self.versions.get(table, 0) for table in sorted(tables))
+
+    def put(self, key: tuple, rows: list[tuple], description: tuple | None, tables: set[str], version: tuple) -> None:
+        size = estimate_size(rows)
+        # A single result should not be able to flush most of the cache
+        if size > self.max_bytes // 4:
+            return
+        with self.lock:
+            # A table was invalidated while the rows were read, they may predate that write
+            if self._version(tables) != version:
+                return
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (rows, description, tables, size, time.monotonic() + self.ttl)
+            self.size += size
+            for table in tables:
+                self.keys_by_table.setdefault(table, set()).add(key)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate(self, tables: set[str] | None = None) -> None:
+        # None drops everything, e.g. after a statement whose target table is unknown
+        with self.lock:
+            if tables is None:
+                self.generation += 1
+                self.entries.clear()
+                self.keys_by_table.clear()
+                self.size = 0
+                return
+            for table in tables:
+                self.versions[table] = self.versions.get(table, 0) + 1
+                for key in list(self.keys_by_table.get(table, ())):
+                    self._remove(key)
+
+    def _remove(self, key: tuple) -> None:
+        rows, description, tables, size, expires_at = self.entries.pop(key)
+        self.size -= size
+        for table in tables:
+            keys = self.keys_by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keys_by_table[table]
+
+
+class CachingCursor:
+    # Wraps a DB-API cursor so SELECTs are answered from a QueryCache and writes invalidate it.
+    # Pass cache=False to execute() to always hit the database for one query. Without a
+    # query_cache (the cache is disabled) every call goes straight to the wrapped cursor.
+    # serve_cached=False reads every SELECT from the database, store_results=False keeps the rows
+    # read through this cursor out of the cache; writes invalidate it either way.
+    def __init__(
+        self,
+        cursor,
+        query_cache: QueryCache | None,
+        namespace: str,
+        serve_cached: bool = True,
+        store_results: bool = True,
+    ):
+        self.cursor = cursor
+        self.query_cache = query_cache
+        self.namespace = namespace
+        self.serve_cached = serve_cached
+        self.store_results = store_results
+        # Tables written in the current transaction; invalidated again on commit, since other
+        # connections may have re-cached the old rows in between
+        self.written_tables: set[str] | None = set()
+        self.rows: list[tuple] | None = None
+        self.position: int = 0
+        self.cached_description: tuple | None = None
+
+    def execute(self, query: str, params=None, cache: bool = True):
+        self.rows = None
+        if self.query_cache is None:
+            return self.cursor.execute(query, params)
+        statement = query.lstrip().upper()
+
+        if statement.startswith("SELECT"):
+            # Reads after an uncommitted write in this transaction may see rows nobody else can
+            if not cache or not self.serve_cached or self.written_tables != set() or UNCACHEABLE_RE.search(query):
+                return self.cursor.execute(query, params)
+
+            key = (self.namespace, normalize_query(query), tuple(params or ()))
+            cached = self.query_cache.get(key)
+            if cached is None:
+                if not self.store_results:
+                    return self.cursor.execute(query, params)
+                tables = {table.lower() for table in READ_TABLES_RE.findall(query)}
+                version = self.query_cache.version(tables)
+                self.cursor.execute(query, params)
+                rows = self.cursor.fetchall()
+                description = self.cursor.description
+                self.query_cache.put(key, rows, description, tables, version)
+            else:
+                rows, description = cached
+            self.rows = rows
+            self.position = 0
+            self.cached_description = description
+            return None
+
+        result = self.cursor.execute(query, params)
+        match = WRITE_TABLE_RE.match(query)
+        if match:
+            table = match.group(1).lower()
+            self.query_cache.invalidate({table})
+            if self.written_tables is not None:
+                self.written_tables.add(table)
+        elif not statement.startswith(("SHOW", "SET", "START", "BEGIN", "COMMIT", "ROLLBACK")):
+            # DDL or anything else we cannot attribute to one table
+            self.query_cache.invalidate()
+            self.written_tables = None
+        return result
+
+    def committed(self) -> None:
+        if self.query_cache is not None:
+            self.query_cache.invalidate(self.written_tables)
+        self.written_tables = set()
+
+    def fetchone(self):
+        if self.rows is None:
+            return self.cursor.fetchone()
+        if self.position >= len(self.rows):
+            return None
+        row = self.rows[self.position]
+        self.position += 1
+        return row
+
+    def fetchmany(self, size: int = 1):
+        if self.rows is None:
+            return self.cursor.fetchmany(size)
+        rows = self.rows[self.position : self.position + size]
+        self.position += len(rows)
+        return rows
+
+    def fetchall(self):
+        if self.rows is None:
+            return self.cursor.fetchall()
+        rows = self.rows[self.position :]
+        self.position = len(self.rows)
+        return rows
+
+    @property
+    def description(self):
+        if self.rows is None:
+            return self.cursor.description
+        return self.cached_description
+
+    @property
+    def rowcount(self) -> int:
+        if self.rows is None:
+            return self.cursor.rowcount
+        return len(self.rows)
+
+    def __getattr__(self, name: str):
+        # lastrowid, close, ... come from the wrapped cursor
+        return getattr(self.cursor, name)
@@ -0,0 +1,114 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+# Embedded SQLite engine for single-node deployments and tests, selected with DB_BACKEND="sqlite".
+# It exposes the small part of the mysql.connector API the app uses (cursor/commit/rollback/close,
+# %s placeholders), so the routes run unchanged on either backend.
+
+SCHEMA_PATH: str = os.path.join(os.path.dirname(__file__), "init_database_sqlite.sql")
+
+# Applied to every new connection. journal_mode=WAL is persistent, the others are per connection.
+PRAGMAS: tuple[str, ...] = (
+    "PRAGMA journal_mode = WAL",  # readers never block the writer and vice versa
+    "PRAGMA synchronous = NORMAL",  # safe with WAL, fsync only at checkpoints
+    "PRAGMA foreign_keys = ON",  # enforce the same FK constraints as MySQL
+    "PRAGMA busy_timeout = 5000",  # wait for the write lock instead of failing right away
+    "PRAGMA cache_size = -65536",  # 64 MiB page cache
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",  # 256 MiB of memory-mapped reads
+)
+
+# Idle connections kept per database file
+POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+
+PLACEHOLDER_RE = re.compile(r"%s")
+
+
+def _convert_timestamp(value: bytes) -> datetime:
+    return datetime.fromisoformat(value.decode())
+
+
+def _convert_decimal(value: bytes) -> Decimal:
+    # Salary is the only DECIMAL column; mysql.connector returns it with its two decimal places
+    return Decimal(value.decode()).quantize(Decimal("0.01"))
+
+
+# Return TIMESTAMP and DECIMAL columns as the same Python types mysql.connector does
+sqlite3.register_converter("TIMESTAMP", _convert_timestamp)
+sqlite3.register_converter("DECIMAL", _convert_decimal)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(Decimal, str)
+
+
+class SQLiteCursor:
+    def __init__(self, cursor: sqlite3.Cursor):
+        self.cursor = cursor
+
+    def execute(self, query: str, params=None):
+        # The app writes mysql.connector style %s placeholders
+        return self.cursor.execute(PLACEHOLDER_RE.sub("?", query), tuple(params or ()))
+
+    def __getattr__(self, name: str):
+        # fetchone, fetchmany, fetchall, lastrowid, rowcount, description, close
+        return getattr(self.cursor, name)
+
+
+class SQLiteConnection:
+    def __init__(self, conn: sqlite3.Connection, pool: queue.LifoQueue):
+        self.conn = conn
+        self.pool = pool
+
+    def cursor(self, **kwargs) -> SQLiteCursor:
+        # mysql.connector options such as buffered=False do not apply, SQLite cursors are lazy anyway
+        return SQLiteCursor(self.conn.cursor())
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        # Like a pooled mysql.connector connection, closing hands it back to the pool
+        if self.conn is None:
+            return
+        self.conn.rollback()
+        try:
+            self.pool.put_nowait(self.conn)
+        except queue.Full:
+            self.conn.close()
+        self.conn = None
+
+
+_pools: dict[str, queue.LifoQueue] = {}
+_pools_lock = threading.Lock()
+
+
+def _open(path: str, create_schema: bool) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False, timeout=5)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    if create_schema and conn.execute("SELECT name FROM sqlite_master WHERE name = 'users'").fetchone() is None:
+        with open(SCHEMA_PATH, encoding="utf-8") as schema_file:
+            conn.executescript(schema_file.read())
+    return conn
+
+
+def connect(path: str, create_schema: bool = False) -> SQLiteConnection:
+    with _pools_lock:
+        if path not in _pools:
+            _pools[path] = queue.LifoQueue(maxsize=POOL_SIZE)
+            # The first connection to a new file creates the schema and seed data
+            _pools[path].put(_open(path, create_schema))
+        pool = _pools[path]
+
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = _open(path, create_schema=False)
+    return SQLiteConnection(conn, pool)
@@ -0,0 +1,164 @@
+import bisect
+import heapq
+import re
+import threading
+from typing import Iterable
+
+COURSE = "course"
+CATEGORY = "category"
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+def word_suffixes(text: str) -> list[str]:
+    # "cardio kickboxing" -> ["cardio kickboxing", "kickboxing"], so a query matches any word start
+    return [text[match.start() :] for match in re.finditer(r"\w+", text)]
+
+
+class TypeaheadIndex:
+    # In-memory prefix index over course names and categories.
+    #
+    # self.entries is a sorted list of (key, kind, ref) tuples, one per word of every course
+    # name and category, where key is the normalized text from that word to the end. A lookup
+    # is a binary search for the query followed by a scan while keys still start with it.
+    # self.names holds only the whole-text keys, so the matches that rank first are found
+    # without scanning past later-word matches.
+    #
+    # A rebuild reads the rows before build() takes the lock, so begin_build() starts recording
+    # the add() and remove() calls made in between and build() applies them again on top.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ready: bool = False
+        self.entries: list[tuple[str, str, str | int]] = []
+        self.names: list[tuple[str, str, str | int]] = []
+        # course id -> (name, category, normalized name)
+        self.courses: dict[int, tuple[str, str | None, str]] = {}
+        self.category_counts: dict[str, int] = {}
+        self.category_names: dict[str, str] = {}
+        # course id -> (name, category), or None when removed, while a rebuild is in progress
+        self.pending: dict[int, tuple[str, str | None] | None] | None = None
+
+    def begin_build(self) -> None:
+        with self.lock:
+            self.pending = {}
+
+    def build(self, rows: Iterable[tuple]) -> None:
+        with self.lock:
+            self.entries = []
+            self.names = []
+            self.courses = {}
+            self.category_counts = {}
+            self.category_names = {}
+            for course_id, name, category in rows:
+                self._add(course_id, name, category, sort=False)
+            self.entries.sort()
+            self.names.sort()
+            for course_id, course in (self.pending or {}).items():
+                self._remove(course_id)
+                if course is not None:
+                    self._add(course_id, *course)
+            self.pending = None
+            self.ready = True
+
+    def add(self, course_id: int, name: str, category: str | None) -> None:
+        with self.lock:
+            if self.pending is not None:
+                self.pending[course_id] = (name, category)
+            # Before the first build the index will pick the course up from MySQL anyway
+            if self.ready:
+                self._remove(course_id)
+                self._add(course_id, name, category)
+
+    def remove(self, course_id: int) -> None:
+        with self.lock:
+            if self.pending is not None:
+                self.pending[course_id] = None
+            if self.ready:
+                self._remove(course_id)
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        prefix = normalize(query)
+        if not prefix or limit <= 0:
+            return []
+
+        with self.lock:
+            # Rank 0 when the whole text starts with the query. Every such match is ranked, since
+            # the best ones (courses before categories, then shorter and alphabetical) can sort
+            # anywhere in the key order
+            ranked = [self._rank(0, kind, ref) for _, kind, ref in self._scan(self.names, prefix)]
+            # Rank 1 when only a later word does; these only fill up the remaining places
+            if len(ranked) < limit:
+                seen = {(rank[4], rank[5]) for rank in ranked}
+                for _, kind, ref in self._scan(self.entries, prefix):
+                    if (kind, ref) not in seen:
+                        seen.add((kind, ref))
+                        ranked.append(self._rank(1, kind, ref))
+
+            suggestions = []
+            for _, _, _, name, kind, ref in heapq.nsmallest(limit, ranked):
+                if kind == COURSE:
+                    category = self.courses[ref][1]  # type: ignore
+                    suggestions.append({"type": COURSE, "id": ref, "name": name, "category": category})
+                else:
+                    suggestions.append({"type": CATEGORY, "name": name})
+        return suggestions
+
+    def _scan(self, entries: list[tuple[str, str, str | int]], prefix: str):
+        index = bisect.bisect_left(entries, (prefix,))
+        while index < len(entries) and entries[index][0].startswith(prefix):
+            yield entries[index]
+            index += 1
+
+    def _rank(self, rank: int, kind: str, ref: str | int) -> tuple:
+        if kind == COURSE:
+            name = self.courses[ref][0]  # type: ignore
+            return (rank, 0, len(name), name, kind, ref)
+        name = self.category_names[ref]  # type: ignore
+        return (rank, 1, len(name), name, kind, ref)
+
+    def _insert(self, entries: list, entry: tuple, sort: bool) -> None:
+        if sort:
+            bisect.insort(entries, entry)
+        else:
+            entries.append(entry)
+
+    def _delete(self, entries: list, entry: tuple) -> None:
+        index = bisect.bisect_left(entries, entry)
+        if index < len(entries) and entries[index] == entry:
+            del entries[index]
+
+    def _add(self, course_id: int, name: str, category: str | None, sort: bool = True) -> None:
+        normalized_name = normalize(name)
+        self.courses[course_id] = (name, category, normalized_name)
+        self._insert(self.names, (normalized_name, COURSE, course_id), sort)
+        for key in word_suffixes(normalized_name):
+            self._insert(self.entries, (key, COURSE, course_id), sort)
+
+        if category:
+            category_key = normalize(category)
+            self.category_counts[category_key] = self.category_counts.get(category_key, 0) + 1
+            if self.category_counts[category_key] == 1:
+                self.category_names[category_key] = category
+                self._insert(self.names, (category_key, CATEGORY, category_key), sort)
+                for key in word_suffixes(category_key):
+                    self._insert(self.entries, (key, CATEGORY, category_key), sort)
+
+    def _remove(self, course_id: int) -> None:
+        if course_id not in self.courses:
+            return
+        _, category, normalized_name = self.courses.pop(course_id)
+        self._delete(self.names, (normalized_name, COURSE, course_id))
+        for key in word_suffixes(normalized_name):
+            self._delete(self.entries, (key, COURSE, course_id))
+
+        if category:
+            category_key = normalize(category)
+            self.category_counts[category_key] -= 1
+            if self.category_counts[category_key] == 0:
+                del self.category_counts[category_key]
+                del self.category_names[category_key]
+                self._delete(self.names, (category_key, CATEGORY, category_key))
+                for key in word_suffixes(category_key):
+                    self._delete(self.entries, (key, CATEGORY, category_key))